@@ -0,0 +1,315 @@
+"""Endpoint benchmark: seed a dataset, drive every route through ASGI, report latencies.
+
+Run from ``backend/`` after ``pip install -r requirements-dev.txt``, against a
+local mongod::
+
+    python -m benchmarks.endpoints_bench --mongo-uri mongodb://localhost:27017 \\
+        --employees 1000 --attendance 100000 --concurrency 16 --requests 500 \\
+        --output bench-results.json
+
+Without ``--mongo-uri`` the embedded memory engine (``memory_store``) is used,
+so the suite runs offline. Pass ``--compare old.json`` to print the change
+against an earlier run.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from bson import ObjectId
+
+import database
+from config import get_settings
+from routes.employees import employee_search_keys
+from snapshots import employee_snapshot
+
+settings = get_settings()
+
+SEED_BATCH_SIZE = 10000
+DEPARTMENTS = ["Engineering", "Sales", "Marketing", "Finance", "Operations",
+               "Support", "HR", "Legal"]
+BASE_DAY = datetime(2020, 1, 1)
+
+
+async def connect(mongo_uri: str, database_name: str):
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        database.db.client = AsyncIOMotorClient(mongo_uri)
+    else:
+        from memory_store import MemoryClient
+        database.db.client = MemoryClient()
+
+    settings.database_name = database_name
+    await database.db.client.drop_database(database_name)
+
+
+async def seed(n_employees: int, n_attendance: int) -> dict:
+    """Insert the dataset in fixed-size batches so memory stays flat at any size."""
+    emp_col = database.get_employees_collection()
+    att_col = database.get_attendance_collection()
+    now = datetime.utcnow()
+
+    employee_ids = []
+    snapshots = []
+    for start in range(0, n_employees, SEED_BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + SEED_BATCH_SIZE, n_employees)):
+            batch.append({
+                "_id": ObjectId(),
+                "employeeId": f"EMP{i:07d}",
+                "fullName": f"Employee {i}",
+                "email": f"employee{i}@example.com",
+                "department": DEPARTMENTS[i % len(DEPARTMENTS)],
+                "createdAt": now,
+                "updatedAt": now
+            })
+        for doc in batch:
+            doc["searchKeys"] = employee_search_keys(doc)
+        await emp_col.insert_many(batch, ordered=False)
+        employee_ids.extend(doc["_id"] for doc in batch)
+        snapshots.extend(employee_snapshot(doc) for doc in batch)
+
+    # Record i belongs to employee i % N on day i // N, so (employeeId, day) stays unique
+    attendance_ids = []
+    for start in range(0, n_attendance, SEED_BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + SEED_BATCH_SIZE, n_attendance)):
+            emp = i % n_employees
+            day = BASE_DAY + timedelta(days=i // n_employees)
+            batch.append({
+                "_id": ObjectId(),
+                "employeeId": employee_ids[emp],
+                "date": day,
+                "day": day.strftime("%Y-%m-%d"),
+                "status": "Present" if random.random() < 0.85 else "Absent",
+                "employee": snapshots[emp],
+                "createdAt": now,
+                "updatedAt": now
+            })
+        await att_col.insert_many(batch, ordered=False)
+        # Keep a bounded sample of ids for detail/update/delete scenarios
+        if len(attendance_ids) < 100000:
+            attendance_ids.extend(doc["_id"] for doc in batch)
+
+    await database.ensure_indexes()
+
+    last_day = BASE_DAY + timedelta(days=max(n_attendance - 1, 0) // max(n_employees, 1))
+    return {
+        "employee_ids": [str(oid) for oid in employee_ids],
+        "attendance_ids": [str(oid) for oid in attendance_ids],
+        "next_day": last_day + timedelta(days=1)
+    }
+
+
+def build_scenarios(data: dict) -> dict:
+    """Map endpoint names to request factories taking the request index."""
+    employee_ids = data["employee_ids"]
+    attendance_ids = data["attendance_ids"]
+    counter = itertools.count()
+
+    # Writes that consume records pull from disjoint slices of the id pools
+    deletable_employees = iter(employee_ids[len(employee_ids) // 2:])
+    deletable_attendance = iter(attendance_ids[len(attendance_ids) // 2:])
+    mutable_attendance = attendance_ids[:len(attendance_ids) // 2] or attendance_ids
+
+    def new_day(i: int) -> str:
+        return (data["next_day"] + timedelta(days=i)).strftime("%Y-%m-%d")
+
+    def new_employee(i: int) -> dict:
+        n = next(counter)
+        return {"employeeId": f"BENCH{n:07d}", "fullName": f"Bench {n}",
+                "email": f"bench{n}@example.com", "department": "Engineering"}
+
+    def import_csv(rows: int) -> bytes:
+        fields = ("employeeId", "fullName", "email", "department")
+        lines = [",".join(fields)]
+        for _ in range(rows):
+            employee = new_employee(0)
+            lines.append(",".join(employee[f] for f in fields))
+        return "\n".join(lines).encode()
+
+    return {
+        "GET /api/employees": lambda i: ("GET", "/api/employees", None),
+        "GET /api/employees/search": lambda i: (
+            "GET", f"/api/employees/search?q=employee {i % 1000}&limit=10", None),
+        "GET /api/employees/{id}": lambda i: (
+            "GET", f"/api/employees/{employee_ids[i % len(employee_ids)]}", None),
+        "POST /api/employees": lambda i: ("POST", "/api/employees", new_employee(i)),
+        "POST /api/employees/import": lambda i: (
+            "POST", "/api/employees/import?format=csv", import_csv(1000)),
+        "PUT /api/employees/{id}": lambda i: (
+            "PUT", f"/api/employees/{employee_ids[i % len(employee_ids)]}",
+            {"fullName": f"Renamed {i}"}),
+        "GET /api/attendance": lambda i: ("GET", "/api/attendance?limit=1000", None),
+        "GET /api/attendance?date": lambda i: (
+            "GET", f"/api/attendance?date={BASE_DAY.strftime('%Y-%m-%d')}", None),
+        "GET /api/attendance/summary": lambda i: ("GET", "/api/attendance/summary", None),
+        "GET /api/attendance/matrix": lambda i: (
+            "GET", f"/api/attendance/matrix?from={BASE_DAY.strftime('%Y-%m-%d')}"
+                   f"&to={new_day(-1)}", None),
+        "GET /api/attendance/export": lambda i: (
+            "GET", f"/api/attendance/export?from={BASE_DAY.strftime('%Y-%m-%d')}"
+                   f"&to={new_day(-1)}", None),
+        "GET /api/attendance/employee/{id}": lambda i: (
+            "GET", f"/api/attendance/employee/{employee_ids[i % len(employee_ids)]}", None),
+        "GET /api/attendance/employee/{id}/stats": lambda i: (
+            "GET", f"/api/attendance/employee/{employee_ids[i % len(employee_ids)]}/stats",
+            None),
+        "GET /api/attendance/{id}": lambda i: (
+            "GET", f"/api/attendance/{attendance_ids[i % len(attendance_ids)]}", None),
+        "POST /api/attendance": lambda i: ("POST", "/api/attendance", {
+            "employeeId": employee_ids[i % len(employee_ids)],
+            "date": new_day(i // len(employee_ids)), "status": "Present"}),
+        "POST /api/attendance/bulk": lambda i: ("POST", "/api/attendance/bulk", [
+            {"employeeId": emp, "date": new_day(1000 + i), "status": "Present"}
+            for emp in employee_ids[:100]]),
+        "PUT /api/attendance/{id}": lambda i: (
+            "PUT", f"/api/attendance/{mutable_attendance[i % len(mutable_attendance)]}",
+            {"status": "Absent" if i % 2 else "Present"}),
+        "DELETE /api/attendance/{id}": lambda i: (
+            "DELETE", f"/api/attendance/{next(deletable_attendance)}", None),
+        "DELETE /api/employees/{id}": lambda i: (
+            "DELETE", f"/api/employees/{next(deletable_employees)}", None),
+    }
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+async def run_scenario(client: httpx.AsyncClient, factory, n_requests: int,
+                       concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    indexes = iter(range(n_requests))
+
+    async def worker():
+        nonlocal errors
+        for i in indexes:
+            try:
+                method, url, body = factory(i)
+            except StopIteration:
+                return
+            start = time.perf_counter()
+            # Raw bytes are sent as-is, for upload endpoints
+            payload = {"content": body} if isinstance(body, bytes) else {"json": body}
+            response = await client.request(method, url, **payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3)
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_report(results: dict, baseline: dict = None):
+    header = f"{'endpoint':38} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>5}"
+    if baseline:
+        header += f" {'Δp95':>8}"
+    print(header)
+    for name, row in results.items():
+        line = (f"{name:38} {row['throughput_rps']:9.1f} {row['p50_ms']:9.2f} "
+                f"{row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['errors']:5d}")
+        old = (baseline or {}).get(name)
+        if old and old["p95_ms"]:
+            line += f" {(row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:+7.1f}%"
+        print(line)
+
+
+async def main_async(args):
+    # Imported after argument parsing so --help works without the app's deps
+    import main
+
+    await connect(args.mongo_uri, args.database)
+    print(f"Seeding {args.employees} employees and {args.attendance} attendance records...")
+    seed_started = time.perf_counter()
+    data = await seed(args.employees, args.attendance)
+    print(f"Seeded in {time.perf_counter() - seed_started:.1f}s")
+
+    scenarios = build_scenarios(data)
+    selected = [name for name in scenarios
+                if not args.only or any(part in name for part in args.only)]
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in selected:
+            results[name] = await run_scenario(client, scenarios[name],
+                                               args.requests, args.concurrency)
+            print(f"  {name}: {results[name]['p95_ms']} ms p95")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "revision": git_revision(),
+                "timestamp": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "backend": "mongod" if args.mongo_uri else "memory",
+                "dataset": {"employees": args.employees, "attendance": args.attendance},
+                "concurrency": args.concurrency,
+                "requests_per_endpoint": args.requests,
+                "results": results
+            }, f, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}")
+
+    if args.mongo_uri and not args.keep:
+        await database.db.client.drop_database(args.database)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default="",
+                        help="local mongod URI; omit to use the embedded memory engine")
+    parser.add_argument("--database", default="hrms-lite-bench")
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--attendance", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per endpoint")
+    parser.add_argument("--only", nargs="*",
+                        help="run only endpoints whose name contains one of these")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="earlier JSON results to diff against")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the seeded database after the run")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
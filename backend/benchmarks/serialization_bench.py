@@ -0,0 +1,91 @@
+"""Micro-benchmark: legacy dict mutation + jsonable_encoder vs. orjson BSON encoding.
+
+Run from ``backend/``::
+
+    python -m benchmarks.serialization_bench --records 10000 --repeat 5
+"""
+import argparse
+import copy
+import json
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from routes.attendance import serialize_attendance
+from serialization import dumps
+
+
+def make_records(n: int) -> list:
+    now = datetime.utcnow()
+    employees = [ObjectId() for _ in range(100)]
+    records = []
+    for i in range(n):
+        day = datetime(2024, 1, 1) + timedelta(days=i % 365)
+        emp_id = employees[i % len(employees)]
+        records.append({
+            "_id": ObjectId(),
+            "employeeId": {
+                "_id": str(emp_id),
+                "fullName": f"Employee {i % 100}",
+                "employeeId": f"EMP{i % 100:04d}",
+                "department": "Engineering"
+            },
+            "date": day,
+            "day": day.strftime("%Y-%m-%d"),
+            "status": "Present" if i % 5 else "Absent",
+            "createdAt": now,
+            "updatedAt": now
+        })
+    return records
+
+
+def legacy_serialize(attendance: dict) -> dict:
+    """The pre-orjson serializer, kept here as the baseline."""
+    attendance["_id"] = str(attendance["_id"])
+    if "date" in attendance and isinstance(attendance["date"], datetime):
+        attendance["date"] = attendance["date"].isoformat().split("T")[0]
+    return attendance
+
+
+def legacy_path(records: list) -> bytes:
+    content = {"success": True,
+               "data": [legacy_serialize(rec) for rec in records]}
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def orjson_path(records: list) -> bytes:
+    return dumps({"success": True,
+                  "data": [serialize_attendance(rec) for rec in records]})
+
+
+def bench(fn, records: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        batch = copy.deepcopy(records)
+        start = time.perf_counter()
+        fn(batch)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    legacy = bench(legacy_path, records, args.repeat)
+    fast = bench(orjson_path, records, args.repeat)
+
+    print(f"records:          {args.records}")
+    print(f"legacy (best):    {legacy * 1000:8.2f} ms")
+    print(f"orjson (best):    {fast * 1000:8.2f} ms")
+    print(f"speedup:          {legacy / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from config import get_settings
+
+settings = get_settings()
+
+
+class TTLCache:
+    """Small in-process cache whose entries expire after a fixed TTL.
+
+    When ``maxsize`` is set the cache also evicts least-recently-used
+    entries once it is full.
+    """
+
+    def __init__(self, ttl: float, maxsize: Optional[int] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups * 100, 1) if lookups else 0
+        }
+
+
+# Dashboard summary counts and matrices, dropped by every employee/attendance
+# write; bounded because matrix keys come from client-supplied ranges
+summary_cache = TTLCache(ttl=settings.summary_cache_ttl,
+                         maxsize=settings.summary_cache_size)
+
+# {_id, fullName, employeeId, department} blocks keyed by employee ObjectId
+employee_cache = TTLCache(ttl=settings.employee_cache_ttl,
+                          maxsize=settings.employee_cache_size)
@@ -5,7 +5,56 @@ from functools import lru_cache
 class Settings(BaseSettings):
     mongodb_uri: str = "mongodb://localhost:27017"
     database_name: str = "hrms-lite"
+    # "mongo" for MongoDB via Motor, "memory" for the embedded engine
+    storage_backend: str = "mongo"
+    memory_snapshot_path: str = ""
+    # MongoDB connection pool, per server and per worker process
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 10
+    mongo_max_idle_time_ms: int = 300000
+    mongo_wait_queue_timeout_ms: int = 5000
+    # Wire compressors in order of preference; the first the server supports is used
+    mongo_compressors: str = "zstd,snappy,zlib"
+    # Read preference for analytics reads (lists, search, summary, matrix,
+    # stats, export); "primary" keeps every read on the primary
+    mongo_analytics_read_preference: str = "secondaryPreferred"
+    # Secondaries lagging further behind are skipped (MongoDB requires >= 90)
+    mongo_analytics_max_staleness: int = 90
+    # Seconds after a write during which that collection's analytics reads stay
+    # on the primary, so clients refetching after their own write see it
+    mongo_read_your_writes_window: float = 10
+    # Seconds between pings that check the pool can still reach the server
+    mongo_health_check_interval: int = 60
     port: int = 5000
+    # "development" runs one auto-reloading worker; "production" runs
+    # web_concurrency workers (0 = one per CPU) on uvloop and httptools
+    server_mode: str = "development"
+    web_concurrency: int = 0
+    # Seconds an idle keep-alive connection stays open, queued connections
+    # the listening socket accepts, seconds open requests get on shutdown
+    server_keep_alive: int = 5
+    server_backlog: int = 2048
+    server_graceful_timeout: int = 30
+    summary_cache_ttl: int = 30
+    # Max entries in the summary cache; each distinct matrix range adds one
+    summary_cache_size: int = 256
+    employee_cache_ttl: int = 300
+    employee_cache_size: int = 10000
+    snapshot_reconcile_interval: int = 3600
+    employee_purge_batch_size: int = 1000
+    employee_purge_batch_delay: float = 0.1
+    employee_purge_poll_interval: int = 300
+    # Finish each purge in a multi-document transaction (requires a replica set)
+    employee_purge_transactions: bool = False
+    # Live events: counter polling interval when change streams are unavailable,
+    # wait before reopening a failed change stream, SSE keep-alive interval
+    events_poll_interval: float = 2.0
+    events_retry_delay: int = 5
+    events_heartbeat_interval: int = 15
+    # Days deletions are kept for /api/sync; older tokens must reload everything
+    sync_tombstone_days: int = 30
+    slow_query_ms: int = 100
+    slow_query_explain_sample_rate: float = 0.1
 
     class Config:
         env_file = ".env"
@@ -1,32 +1,81 @@
+import asyncio
+import time
+from datetime import datetime
+
 import certifi
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+from pymongo.errors import OperationFailure
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 from config import get_settings
+from metrics import event_listeners, pool_checked_out, pool_connections
+from memory_store import MemoryClient
+from slowlog import SlowQueryListener
+from versions import ATTENDANCES, EMPLOYEES, collection_versions
 
 settings = get_settings()
 
 
 class Database:
+    # AsyncIOMotorClient, or MemoryClient when STORAGE_BACKEND=memory
     client: AsyncIOMotorClient = None
 
 
 db = Database()
 
+UNIQUE_ATTENDANCE_INDEX = "employeeId_1_day_1"
+# Server error code for dropping an index that does not exist
+INDEX_NOT_FOUND = 27
+
+# Unique per live employee; tombstones keep them under ``deleted``
+EMPLOYEE_UNIQUE_FIELDS = ("employeeId", "email")
+
+# Outcome of the latest pool health check, reported by /api/health
+pool_health = {"healthy": None, "latencyMs": None, "checkedAt": None}
+# Seconds warm-up waits for the driver to open the rest of minPoolSize
+POOL_WARM_TIMEOUT = 5
+
+_analytics_mode = read_pref_mode_from_name(settings.mongo_analytics_read_preference)
+# maxStalenessSeconds is not allowed with "primary"
+ANALYTICS_READ_PREFERENCE = make_read_preference(
+    _analytics_mode, None, settings.mongo_analytics_max_staleness if _analytics_mode else -1)
+
 
 async def connect_to_mongo():
     """Connect to MongoDB with proper SSL certificate handling."""
-    print(f"Connecting to MongoDB...")
-    client_kwargs = {
-        "serverSelectionTimeoutMS": 30000,
-        "connectTimeoutMS": 30000,
-    }
-    # Only use certifi CA bundle for Atlas (SRV) connections
-    if "mongodb+srv" in settings.mongodb_uri or "mongodb.net" in settings.mongodb_uri:
-        client_kwargs["tlsCAFile"] = certifi.where()
+    if settings.storage_backend == "memory":
+        db.client = MemoryClient(snapshot_path=settings.memory_snapshot_path or None)
+        print("Using embedded in-memory storage engine.")
+    else:
+        print(f"Connecting to MongoDB...")
+        client_kwargs = {
+            "serverSelectionTimeoutMS": 30000,
+            "connectTimeoutMS": 30000,
+            "maxPoolSize": settings.mongo_max_pool_size,
+            "minPoolSize": settings.mongo_min_pool_size,
+            "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+            "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+            # Command timings and pool gauges for /api/metrics, plus the slow-query log
+            "event_listeners": event_listeners() + [SlowQueryListener()],
+        }
+        # Only use certifi CA bundle for Atlas (SRV) connections
+        if "mongodb+srv" in settings.mongodb_uri or "mongodb.net" in settings.mongodb_uri:
+            client_kwargs["tlsCAFile"] = certifi.where()
+        if settings.mongo_compressors:
+            client_kwargs["compressors"] = settings.mongo_compressors
 
-    db.client = AsyncIOMotorClient(settings.mongodb_uri, **client_kwargs)
-    # Verify connection
-    await db.client.admin.command('ping')
-    print("MongoDB connected successfully!")
+        db.client = AsyncIOMotorClient(settings.mongodb_uri, **client_kwargs)
+        # Verify connection
+        await db.client.admin.command('ping')
+        print("MongoDB connected successfully!")
+        opened = await warm_pool()
+        print(f"MongoDB pool warmed to {opened} connections.")
+
+    # Backfill derived fields before the indexes that depend on them
+    await migrate_attendance_days()
+    await remove_duplicate_attendance()
+    await migrate_employee_tombstones()
+    await migrate_employee_search_keys()
 
     # Create indexes for faster queries
     await ensure_indexes()
@@ -35,8 +84,59 @@ async def connect_to_mongo():
 connect_db = connect_to_mongo
 
 
+async def warm_pool() -> int:
+    """Open ``minPoolSize`` connections before the first requests need them."""
+    target = settings.mongo_min_pool_size
+    # Concurrent pings each check out a connection; the driver tops up the rest
+    await asyncio.gather(*(db.client.admin.command("ping") for _ in range(target)))
+    deadline = time.monotonic() + POOL_WARM_TIMEOUT
+    while pool_connections.total() < target and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    return int(pool_connections.total())
+
+
+async def check_pool() -> bool:
+    """Ping through the pool and record the outcome in ``pool_health``."""
+    started = time.perf_counter()
+    try:
+        await db.client.admin.command("ping")
+        healthy = True
+    except Exception as e:
+        print(f"MongoDB health check warning: {e}")
+        healthy = False
+    if healthy and pool_health["healthy"] is False:
+        print("MongoDB connection restored.")
+    pool_health.update(
+        healthy=healthy,
+        latencyMs=round((time.perf_counter() - started) * 1000, 1) if healthy else None,
+        checkedAt=datetime.utcnow())
+    return healthy
+
+
+async def pool_health_checker():
+    """Background task checking the pool every ``mongo_health_check_interval`` seconds.
+
+    Idle connections past ``maxIdleTimeMS`` are replaced by the driver; the
+    pings make a lost server show up in the log and ``/api/health`` before
+    requests fail on it.
+    """
+    while True:
+        await asyncio.sleep(settings.mongo_health_check_interval)
+        await check_pool()
+
+
+def pool_stats() -> dict:
+    return {
+        **pool_health,
+        "connections": int(pool_connections.total()),
+        "checkedOut": int(pool_checked_out.total()),
+        "maxSize": settings.mongo_max_pool_size,
+    }
+
+
 async def close_mongo_connection():
     if db.client:
+        # The memory engine writes its snapshot here when one is configured
         db.client.close()
         print("MongoDB connection closed.")
 
@@ -48,12 +148,70 @@ def get_database():
     return db.client[settings.database_name]
 
 
-def get_employees_collection():
-    return get_database()["employees"]
+def _read_collection(name: str, analytics: bool):
+    """``name`` on the primary, or on ``ANALYTICS_READ_PREFERENCE`` for analytics reads.
+
+    Analytics reads tolerate bounded replication lag, but stay on the primary
+    for ``mongo_read_your_writes_window`` seconds after the collection is
+    written, so a refetch right after a write (and the ETag and summary cache
+    it fills) is not served from a secondary that has not caught up. Other
+    reads are pinned to the primary, even if ``MONGODB_URI`` sets a
+    readPreference.
+    """
+    collection = get_database()[name]
+    if analytics and not collection_versions.changed_within(
+            name, settings.mongo_read_your_writes_window):
+        return collection.with_options(read_preference=ANALYTICS_READ_PREFERENCE)
+    return collection.with_options(read_preference=ReadPreference.PRIMARY)
+
+
+def get_employees_collection(analytics: bool = False):
+    return _read_collection(EMPLOYEES, analytics)
+
+
+def get_attendance_collection(analytics: bool = False):
+    return _read_collection(ATTENDANCES, analytics)
+
+
+def get_attendance_rollups_collection():
+    return _read_collection("attendance_monthly", analytics=False)
+
+
+def get_deletions_collection():
+    return _read_collection("deletions", analytics=False)
+
+
+def get_versions_collection():
+    return _read_collection("versions", analytics=False)
 
 
-def get_attendance_collection():
-    return get_database()["attendances"]
+def get_jobs_collection():
+    return _read_collection("jobs", analytics=False)
+
+
+async def ensure_live_unique_index(collection, field: str) -> None:
+    """Unique index on ``field`` that skips documents without it.
+
+    The server refuses to change an index's options in place, so a full
+    unique index from an earlier version is replaced by ``<field>_live``.
+    The new index is built first and the old one dropped only after, so
+    ``field`` is never left without a unique index.
+    """
+    partial = {field: {"$exists": True}}
+    indexes = await collection.index_information()
+    if not any(info.get("unique") and info.get("partialFilterExpression") == partial
+               for info in indexes.values()):
+        await collection.create_index(field, unique=True, partialFilterExpression=partial,
+                                      name=f"{field}_live")
+    old = indexes.get(f"{field}_1")
+    if old and old.get("partialFilterExpression") != partial:
+        try:
+            await collection.drop_index(f"{field}_1")
+            print(f"Replaced the unique {field} index with one for live employees only.")
+        except OperationFailure as e:
+            # Another worker starting at the same time dropped it first
+            if e.code != INDEX_NOT_FOUND:
+                raise
 
 
 async def ensure_indexes():
@@ -63,17 +221,138 @@ async def ensure_indexes():
         att_col = get_attendance_collection()
 
         # Employee indexes
-        await emp_col.create_index("employeeId", unique=True)
-        await emp_col.create_index("email", unique=True)
         await emp_col.create_index("department")
         await emp_col.create_index("createdAt")
+        await emp_col.create_index([("createdAt", -1), ("_id", -1)])
+        # Multikey index of lowercased terms for prefix search
+        await emp_col.create_index("searchKeys")
+        # Soft-deleted employees, reloaded when another process deletes one
+        await emp_col.create_index(
+            "deletedAt", partialFilterExpression={"deletedAt": {"$exists": True}})
+        # Keyset order for /api/sync
+        await emp_col.create_index([("updatedAt", 1), ("_id", 1)])
 
         # Attendance indexes
         await att_col.create_index("employeeId")
         await att_col.create_index("date")
         await att_col.create_index([("employeeId", 1), ("date", 1)])
         await att_col.create_index("status")
+        await att_col.create_index("day")
+        await att_col.create_index([("updatedAt", 1), ("_id", 1)])
+
+        # Monthly rollups, one per employee per closed month
+        await get_attendance_rollups_collection().create_index(
+            [("employeeId", 1), ("month", 1)], unique=True)
+
+        # Tombstones of hard deletes for /api/sync, expired after the retention
+        del_col = get_deletions_collection()
+        await del_col.create_index([("deletedAt", 1), ("_id", 1)])
+        await del_col.create_index(
+            "deletedAt", expireAfterSeconds=settings.sync_tombstone_days * 86400)
 
         print("Database indexes ensured.")
     except Exception as e:
         print(f"Index creation warning: {e}")
+
+    try:
+        # Unique among live employees only, since tombstones move their keys
+        # under deleted.* (see routes.employees.delete_employee)
+        for field in EMPLOYEE_UNIQUE_FIELDS:
+            await ensure_live_unique_index(get_employees_collection(), field)
+    except Exception as e:
+        # Employee routes rely on these indexes alone to reject duplicates
+        raise RuntimeError(f"Cannot create the unique employee indexes: {e}") from e
+
+    try:
+        # One attendance record per employee per day, enforced by Mongo
+        await get_attendance_collection().create_index(
+            [("employeeId", 1), ("day", 1)],
+            unique=True,
+            partialFilterExpression={"day": {"$exists": True}}
+        )
+    except Exception as e:
+        # Attendance routes rely on this index alone to reject a second mark
+        raise RuntimeError(f"Cannot create the unique attendance index: {e}") from e
+
+
+async def migrate_attendance_days():
+    """Backfill the YYYY-MM-DD ``day`` key on attendance saved before it existed."""
+    try:
+        result = await get_attendance_collection().update_many(
+            {"day": {"$exists": False}},
+            [{"$set": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}}}}]
+        )
+        if result.modified_count:
+            print(f"Backfilled day key on {result.modified_count} attendance records.")
+    except Exception as e:
+        print(f"Attendance day migration warning: {e}")
+
+
+async def remove_duplicate_attendance():
+    """Keep one attendance record per employee per day before indexing them.
+
+    Duplicates come from concurrent marks made before the unique
+    (employeeId, day) index existed. The most recently updated record of
+    each pair wins. Skipped once the index is in place.
+    """
+    collection = get_attendance_collection()
+    if UNIQUE_ATTENDANCE_INDEX in await collection.index_information():
+        return
+
+    removed, months, days = [], set(), 0
+    async for group in collection.aggregate([
+        {"$match": {"day": {"$exists": True}}},
+        {"$sort": {"updatedAt": -1, "_id": -1}},
+        {"$group": {"_id": {"employeeId": "$employeeId", "day": "$day"},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True):
+        removed += group["ids"][1:]
+        days += 1
+        months.add((group["_id"]["employeeId"], group["_id"]["day"][:7]))
+    if not removed:
+        return
+
+    # Imported here: both modules import this one
+    from deletions import record_deletions
+    from rollups import invalidate_monthly_rollups
+    await collection.delete_many({"_id": {"$in": removed}})
+    await record_deletions(ATTENDANCES, removed)
+    await invalidate_monthly_rollups(
+        (employee_id, datetime.strptime(month, "%Y-%m")) for employee_id, month in months)
+    print(f"Removed {len(removed)} duplicate attendance records "
+          f"from {days} employee-days.")
+
+
+# Server-side form of ``routes.employees.employee_search_keys``, for pipeline updates
+EMPLOYEE_SEARCH_KEYS_EXPRESSION = {"$setUnion": [
+    [{"$toLower": "$fullName"}, {"$toLower": "$employeeId"}, {"$toLower": "$email"}],
+    {"$split": [{"$toLower": "$fullName"}, " "]}
+]}
+
+
+async def migrate_employee_tombstones():
+    """Move unique keys aside on employees soft-deleted before tombstones did."""
+    try:
+        result = await get_employees_collection().update_many(
+            {"deletedAt": {"$exists": True},
+             "$or": [{field: {"$exists": True}} for field in EMPLOYEE_UNIQUE_FIELDS]},
+            {"$rename": {field: f"deleted.{field}" for field in EMPLOYEE_UNIQUE_FIELDS}}
+        )
+        if result.modified_count:
+            print(f"Released unique keys of {result.modified_count} deleted employees.")
+    except Exception as e:
+        print(f"Employee tombstone migration warning: {e}")
+
+
+async def migrate_employee_search_keys():
+    """Backfill ``searchKeys`` on employees saved before search existed."""
+    try:
+        result = await get_employees_collection().update_many(
+            {"searchKeys": {"$exists": False}, "deletedAt": {"$exists": False}},
+            [{"$set": {"searchKeys": EMPLOYEE_SEARCH_KEYS_EXPRESSION}}]
+        )
+        if result.modified_count:
+            print(f"Backfilled search keys on {result.modified_count} employees.")
+    except Exception as e:
+        print(f"Employee search key migration warning: {e}")
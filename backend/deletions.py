@@ -0,0 +1,15 @@
+from datetime import datetime
+from typing import Iterable
+
+from bson import ObjectId
+
+from database import get_deletions_collection
+
+
+async def record_deletions(collection: str, ids: Iterable[ObjectId], session=None) -> None:
+    """Leave tombstones of hard-deleted documents for ``/api/sync`` clients."""
+    now = datetime.utcnow()
+    docs = [{"collection": collection, "documentId": doc_id, "deletedAt": now}
+            for doc_id in ids]
+    if docs:
+        await get_deletions_collection().insert_many(docs, session=session)
@@ -0,0 +1,203 @@
+import asyncio
+from typing import Iterable, List, Optional, Set
+
+from pymongo.errors import OperationFailure
+
+from cache import employee_cache, summary_cache
+from config import get_settings
+from database import get_database
+from purge import schedule_purge
+from versions import ATTENDANCES, EMPLOYEES, collection_versions
+
+settings = get_settings()
+
+WATCHED_COLLECTIONS = (EMPLOYEES, ATTENDANCES)
+# Fields carried on delta events; anything else in a change is left out
+DELTA_FIELDS = {
+    EMPLOYEES: ("employeeId", "fullName", "department"),
+    ATTENDANCES: ("employeeId", "day", "status"),
+}
+# Larger bursts (bulk writes, imports, purges, snapshot fan-out) are sent as
+# one event per collection instead of one per document
+EVENTS_MAX_DELTAS = 50
+# Events buffered per subscriber before it is told to resync instead
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# The server rejects $changeStream on a standalone mongod with this code
+CHANGE_STREAM_UNSUPPORTED = 40573
+# The resume token fell off the oplog; restart from now and resync clients
+CHANGE_STREAM_HISTORY_LOST = (280, 286)
+
+WATCH_PIPELINE = [
+    {"$match": {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)},
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+    {"$project": {
+        "operationType": 1, "ns.coll": 1, "documentKey": 1,
+        "updateDescription.updatedFields": 1,
+        **{f"fullDocument.{field}": 1
+           for fields in DELTA_FIELDS.values() for field in fields},
+        "fullDocument.deletedAt": 1,
+    }},
+]
+
+RESYNC = {"type": "resync"}
+
+# Last position seen by the change stream, so a restarted watcher misses nothing
+_resume_token: Optional[dict] = None
+
+
+class EventBroker:
+    """Fans change events out to every open ``GET /api/events`` stream."""
+
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        # "changeStream" once the watcher is running, "polling" on fallback
+        self.mode = "starting"
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict) -> None:
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A slow client gets one resync in place of its backlog
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    def publish_changes(self, deltas: List[dict], summarize: bool = False) -> None:
+        if summarize or len(deltas) > EVENTS_MAX_DELTAS:
+            deltas = [{"collection": name}
+                      for name in dict.fromkeys(d["collection"] for d in deltas)]
+        for delta in deltas:
+            self.publish({"type": "change", **delta})
+
+
+broker = EventBroker()
+
+
+def change_delta(change: dict) -> dict:
+    """Compact event for one change stream document."""
+    collection = change["ns"]["coll"]
+    document = change.get("fullDocument") or {}
+    updated = (change.get("updateDescription") or {}).get("updatedFields") or {}
+
+    op = change["operationType"]
+    if op == "replace":
+        op = "update"
+    if "deletedAt" in updated or "deletedAt" in document:
+        # Employees are soft-deleted with a tombstone
+        op = "delete"
+
+    delta = {"collection": collection, "op": op, "id": change["documentKey"]["_id"]}
+    for field in DELTA_FIELDS[collection]:
+        if field in document:
+            delta[field] = document[field]
+        elif field in updated:
+            delta[field] = updated[field]
+    return delta
+
+
+def forget_cached(deltas: List[dict]) -> None:
+    """Drop this process's caches for changes seen on the stream.
+
+    Write routes already do this for their own writes; with several server
+    workers, the others learn of those writes here, usually before their
+    next conditional GET reads the shared versions.
+    """
+    summary_cache.invalidate()
+    for delta in deltas:
+        if delta["collection"] == EMPLOYEES:
+            employee_cache.invalidate(delta["id"])
+            if delta["op"] == "delete":
+                # Hide the attendance of an employee another worker deleted;
+                # a tombstone the purge already removed is skipped quickly
+                schedule_purge(delta["id"])
+
+
+async def watch_changes() -> None:
+    """Publish deltas from one database-wide change stream until it ends.
+
+    Changes are published whenever the stream goes idle. A burst of more
+    than ``EVENTS_MAX_DELTAS`` is summarized until the stream is idle again.
+    """
+    global _resume_token
+    database = get_database()
+    async with database.watch(WATCH_PIPELINE, resume_after=_resume_token) as stream:
+        broker.mode = "changeStream"
+        print("Watching employees and attendances for live events.")
+        pending = []
+        bursting = False
+        while stream.alive:
+            change = await stream.try_next()
+            if change is not None:
+                pending.append(change_delta(change))
+                if len(pending) <= EVENTS_MAX_DELTAS:
+                    continue
+                bursting = True
+            if pending:
+                forget_cached(pending)
+                broker.publish_changes(pending, summarize=bursting)
+                pending = []
+            if change is None:
+                bursting = False
+            # Advanced only past published changes, so a reconnect replays the rest
+            _resume_token = stream.resume_token
+
+
+async def poll_versions(collections: Iterable[str] = WATCHED_COLLECTIONS):
+    """Fallback without change streams: publish whenever a collection's version changes.
+
+    One small query on the shared versions per interval, which sees writes
+    made by every server process.
+    """
+    broker.mode = "polling"
+    await collection_versions.refresh(*collections)
+    seen = {name: collection_versions.get(name) for name in collections}
+    while True:
+        await asyncio.sleep(settings.events_poll_interval)
+        try:
+            await collection_versions.refresh(*collections)
+        except Exception as e:
+            print(f"Version polling warning: {e}")
+            continue
+        changed = [name for name in seen if collection_versions.get(name) != seen[name]]
+        for name in changed:
+            seen[name] = collection_versions.get(name)
+        broker.publish_changes([{"collection": name} for name in changed])
+
+
+async def change_watcher():
+    """Background task feeding the broker; one watcher serves every subscriber."""
+    if not hasattr(get_database(), "watch"):
+        # The embedded engine has no change streams, and no other writers
+        await poll_versions()
+        return
+
+    global _resume_token
+    while True:
+        try:
+            await watch_changes()
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAM_UNSUPPORTED:
+                print("Change streams need a replica set; polling for live events.")
+                await poll_versions()
+                return
+            print(f"Change stream warning: {e}")
+            if e.code in CHANGE_STREAM_HISTORY_LOST:
+                _resume_token = None
+                broker.publish(RESYNC)
+        except Exception as e:
+            print(f"Change stream warning: {e}")
+        await asyncio.sleep(settings.events_retry_delay)
@@ -0,0 +1,85 @@
+"""Incremental CSV and Parquet writers for attendance exports.
+
+Rows arrive in batches and each batch is encoded and handed to the response
+before the next one is read, so an export of any size needs memory for a
+single batch only.
+"""
+import csv
+import io
+from typing import AsyncIterator, List, Tuple
+
+EXPORT_COLUMNS = ("date", "employeeId", "fullName", "department", "status")
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+Row = Tuple[str, str, str, str, str]
+
+
+async def stream_csv(batches: AsyncIterator[List[Row]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only: the range held no attendance
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what the Parquet writer emits until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_parquet(batches: AsyncIterator[List[Row]]) -> AsyncIterator[bytes]:
+    """One Parquet row group per batch; the footer follows the last one."""
+    # Imported on first use so the API starts without loading Arrow
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("date", pa.date32()),
+        ("employeeId", pa.string()),
+        ("fullName", pa.string()),
+        ("department", pa.string()),
+        ("status", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        async for rows in batches:
+            date_column, *text_columns = zip(*rows)
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(date_column, pa.string()).cast(pa.date32())]
+                + [pa.array(column, pa.string()) for column in text_columns],
+                schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
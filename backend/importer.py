@@ -0,0 +1,110 @@
+"""Streaming row parsers for bulk employee imports.
+
+Uploads are decoded chunk by chunk and yielded row by row, so memory stays
+bounded by the import batch size rather than by the file size.
+"""
+import codecs
+import csv
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+import orjson
+
+IMPORT_FIELDS = ("employeeId", "fullName", "email", "department")
+
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+}
+
+# A parsed row, or the reason it could not be parsed, keyed by its 1-based position
+Row = Tuple[int, Union[dict, str]]
+
+
+class ImportFormatError(ValueError):
+    """The upload as a whole cannot be read, as opposed to a single bad row."""
+
+
+def import_format(content_type: str) -> Optional[str]:
+    return IMPORT_CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a UTF-8 byte stream into lines, dropping a leading BOM."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    try:
+        async for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            lines = buffer.split("\n")
+            buffer = lines.pop()
+            for line in lines:
+                yield line.rstrip("\r")
+        buffer += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise ImportFormatError("File must be UTF-8 encoded")
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    """Rows of a CSV upload with a header line naming the employee fields."""
+    header = None
+    record: List[str] = []
+    quotes = 0
+    row = 0
+    async for line in iter_lines(chunks):
+        # A quoted field may span lines; a record ends once its quotes balance
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        text = "\n".join(record)
+        record, quotes = [], 0
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            missing = [f for f in IMPORT_FIELDS if f not in header]
+            if missing:
+                raise ImportFormatError(f"Missing CSV columns: {', '.join(missing)}")
+            continue
+
+        row += 1
+        yield row, dict(zip(header, values))
+
+    if record:
+        yield row + 1, "Unterminated quoted field"
+
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    """Rows of a newline-delimited JSON upload, one employee object per line."""
+    row = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            value = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield row, "Invalid JSON"
+            continue
+        yield row, value if isinstance(value, dict) else "Row must be a JSON object"
+
+
+async def iter_batches(rows: AsyncIterator[Row], size: int) -> AsyncIterator[List[Row]]:
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_rows(fmt: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    return iter_csv_rows(chunks) if fmt == "csv" else iter_ndjson_rows(chunks)
@@ -1,28 +1,42 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
+import math
+import os
 
 from config import settings
-from database import connect_db, close_db
+from cache import employee_cache
+from database import close_db, connect_db, db, pool_health_checker, pool_stats
+from metrics import MetricsMiddleware, registry
+from serialization import BSONJSONResponse
+from slowlog import REQUEST_ID_HEADER, RequestIdMiddleware
+from events import broker, change_watcher
+from purge import employee_purger, load_pending_deletes
+from snapshots import snapshot_reconciler
 from routes.employees import router as employees_router
 from routes.attendance import router as attendance_router
-
-
-async def keep_alive():
-    """Periodic self-ping to prevent Render free-tier cold starts."""
-    while True:
-        await asyncio.sleep(600)  # every 10 minutes
+from routes.events import router as events_router
+from routes.sync import router as sync_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_db()
-    task = asyncio.create_task(keep_alive())
+    # Hide attendance of employees deleted before a restart from the first request on
+    await load_pending_deletes()
+    health_checker = asyncio.create_task(pool_health_checker())
+    reconciler = asyncio.create_task(snapshot_reconciler())
+    purger = asyncio.create_task(employee_purger())
+    watcher = asyncio.create_task(change_watcher())
     print(f"🚀 Server running on http://localhost:{settings.port}")
     yield
-    task.cancel()
+    health_checker.cancel()
+    reconciler.cancel()
+    purger.cancel()
+    watcher.cancel()
     await close_db()
     print("Server shutdown complete")
 
@@ -31,7 +45,8 @@ app = FastAPI(
     title="HRMS Lite API",
     description="Human Resource Management System - Lite Edition",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=BSONJSONResponse
 )
 
 app.add_middleware(
@@ -40,10 +55,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[REQUEST_ID_HEADER],
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(employees_router)
 app.include_router(attendance_router)
+app.include_router(events_router)
+app.include_router(sync_router)
 
 
 @app.get("/")
@@ -57,19 +78,81 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
+    try:
+        await db.client.admin.command("ping")
+        database_status = "connected"
+    except Exception:
+        database_status = "disconnected"
+
     return {
         "success": True,
-        "status": "healthy",
-        "database": "connected"
+        "status": "healthy" if database_status == "connected" else "degraded",
+        "database": database_status,
+        "pool": pool_stats(),
+        "cache": {
+            "employees": employee_cache.stats()
+        },
+        "events": {
+            "mode": broker.mode,
+            "subscribers": broker.subscriber_count
+        }
+    }
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, MongoDB and pool metrics."""
+    return PlainTextResponse(registry.render(),
+                             media_type="text/plain; version=0.0.4")
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: its affinity, capped by a container's CPU quota."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") \
+        else os.cpu_count() or 1
+    # cgroup v2 writes "<quota> <period>", v1 splits them over two files
+    for quota_file, period_file in (("/sys/fs/cgroup/cpu.max", None),
+                                    ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us",
+                                     "/sys/fs/cgroup/cpu/cpu.cfs_period_us")):
+        try:
+            with open(quota_file) as f:
+                quota, *period = f.read().split()
+            if period_file:
+                with open(period_file) as f:
+                    period = f.read().split()
+        except (OSError, ValueError):
+            continue
+        if quota not in ("max", "-1") and period:
+            cpus = min(cpus, math.ceil(int(quota) / int(period[0])))
+        break
+    return max(cpus, 1)
+
+
+def server_options() -> dict:
+    """``uvicorn.run`` arguments for ``settings.server_mode``."""
+    options = {
+        "host": "0.0.0.0",
+        "port": int(os.environ.get("PORT", settings.port)),
+        "timeout_keep_alive": settings.server_keep_alive,
+        "backlog": settings.server_backlog,
+        "timeout_graceful_shutdown": settings.server_graceful_timeout,
+    }
+    if settings.server_mode != "production":
+        return {**options, "reload": True}
+
+    workers = settings.web_concurrency or available_cpus()
+    if settings.storage_backend == "memory" and workers > 1:
+        print("The embedded engine cannot be shared between processes; using one worker.")
+        workers = 1
+    return {
+        **options,
+        "workers": workers,
+        "loop": "uvloop",
+        "http": "httptools",
+        # Requests are already counted by /api/metrics and timed by the slow log
+        "access_log": False,
     }
 
 
 if __name__ == "__main__":
-    import os
-    port = int(os.environ.get("PORT", settings.port))
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=port,
-        reload=True
-    )
+    uvicorn.run("main:app", **server_options())
@@ -0,0 +1,1223 @@
+"""Embedded in-process storage engine speaking the subset of Motor's API the routes use.
+
+Selected with ``STORAGE_BACKEND=memory``. Collections keep documents in a dict
+keyed by ``_id`` and maintain real secondary indexes (hash buckets per index
+key) that answer equality and ``$in`` lookups without a scan; unique indexes
+raise the same ``DuplicateKeyError`` / ``BulkWriteError`` as MongoDB, so route
+error handling is unchanged. Data can be persisted to a BSON snapshot file on
+shutdown and reloaded on start.
+"""
+import itertools
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from pymongo import (DeleteMany, DeleteOne, InsertOne, ReturnDocument, UpdateMany,
+                     UpdateOne)
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (BulkWriteResult, DeleteResult, InsertManyResult,
+                             InsertOneResult, UpdateResult)
+
+_MISSING = object()
+
+
+# --- document helpers -------------------------------------------------------
+
+def _copy(value: Any) -> Any:
+    """Copy nested dicts/lists; leaves immutable leaves (ObjectId, datetime) shared."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _get(doc: dict, path: str) -> Any:
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set(doc: dict, path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset(doc: dict, path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _freeze(value: Any) -> Any:
+    """Hashable form of a field value for index keys."""
+    if value is _MISSING:
+        return None
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# --- query matching ---------------------------------------------------------
+
+def _compare(a: Any, b: Any, op) -> bool:
+    if a is _MISSING or a is None or b is None:
+        return False
+    try:
+        return op(a, b)
+    except TypeError:
+        return False
+
+
+def _equals(value: Any, target: Any) -> bool:
+    if value is _MISSING:
+        return target is None
+    if isinstance(value, list) and not isinstance(target, list):
+        return target in value
+    return value == target
+
+
+_ELEMENT_OPS = {"$gt", "$gte", "$lt", "$lte", "$regex"}
+
+
+def _match_op(value: Any, op: str, arg: Any, ops: dict) -> bool:
+    if op == "$gt":
+        return _compare(value, arg, lambda a, b: a > b)
+    if op == "$gte":
+        return _compare(value, arg, lambda a, b: a >= b)
+    if op == "$lt":
+        return _compare(value, arg, lambda a, b: a < b)
+    if op == "$lte":
+        return _compare(value, arg, lambda a, b: a <= b)
+    flags = re.IGNORECASE if "i" in ops.get("$options", "") else 0
+    pattern = arg if isinstance(arg, re.Pattern) else re.compile(arg, flags)
+    return isinstance(value, str) and pattern.search(value) is not None
+
+
+def _match_ops(value: Any, ops: dict) -> bool:
+    for op, arg in ops.items():
+        if op == "$eq":
+            ok = _equals(value, arg)
+        elif op == "$ne":
+            ok = not _equals(value, arg)
+        elif op in _ELEMENT_OPS:
+            # Like MongoDB, range and regex conditions match any array element
+            if isinstance(value, list):
+                ok = any(_match_op(v, op, arg, ops) for v in value)
+            else:
+                ok = _match_op(value, op, arg, ops)
+        elif op == "$in":
+            ok = any(_equals(value, a) for a in arg)
+        elif op == "$nin":
+            ok = not any(_equals(value, a) for a in arg)
+        elif op == "$exists":
+            ok = (value is not _MISSING) == bool(arg)
+        elif op == "$options":
+            ok = True
+        elif op == "$not":
+            ok = not _match_ops(value, arg)
+        else:
+            raise OperationFailure(f"Unsupported query operator {op} in memory engine")
+        if not ok:
+            return False
+    return True
+
+
+def _is_operator_doc(cond: Any) -> bool:
+    return isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond)
+
+
+def match(doc: dict, query: Optional[dict]) -> bool:
+    if not query:
+        return True
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(match(doc, q) for q in cond):
+                return False
+        elif key == "$and":
+            if not all(match(doc, q) for q in cond):
+                return False
+        elif key == "$nor":
+            if any(match(doc, q) for q in cond):
+                return False
+        elif key == "$expr":
+            if not evaluate(cond, doc):
+                return False
+        else:
+            value = _get(doc, key)
+            if _is_operator_doc(cond):
+                if not _match_ops(value, cond):
+                    return False
+            elif isinstance(cond, re.Pattern):
+                if not _match_ops(value, {"$regex": cond}):
+                    return False
+            elif not _equals(value, cond):
+                return False
+    return True
+
+
+# --- aggregation expressions ------------------------------------------------
+
+def _field_getter(path: str) -> Callable[[dict], Any]:
+    parts = path.split(".")
+    if len(parts) == 1:
+        field = parts[0]
+        return lambda doc: doc.get(field) if isinstance(doc, dict) else None
+
+    def get(doc):
+        value = _get(doc, path)
+        return None if value is _MISSING else value
+    return get
+
+
+_BINARY_OPS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: _compare(a, b, lambda x, y: x > y),
+    "$gte": lambda a, b: _compare(a, b, lambda x, y: x >= y),
+    "$lt": lambda a, b: _compare(a, b, lambda x, y: x < y),
+    "$lte": lambda a, b: _compare(a, b, lambda x, y: x <= y),
+    "$in": lambda a, b: a in (b or []),
+    "$subtract": lambda a, b: a - b,
+    "$split": lambda a, b: a.split(b) if isinstance(a, str) else None,
+    "$divide": lambda a, b: a / b if b else None,
+}
+
+_UNARY_OPS = {
+    "$not": lambda a: not a,
+    "$toLower": lambda a: (a or "").lower(),
+    "$toUpper": lambda a: (a or "").upper(),
+    "$year": lambda a: a.year,
+    "$month": lambda a: a.month,
+    "$dayOfMonth": lambda a: a.day,
+    "$isoWeek": lambda a: a.isocalendar()[1],
+    "$isoWeekYear": lambda a: a.isocalendar()[0],
+    "$size": lambda a: len(a or []),
+}
+
+
+def _product(values):
+    result = 1
+    for v in values:
+        result *= v
+    return result
+
+
+_VARIADIC_OPS = {
+    "$and": all,
+    "$or": any,
+    "$add": lambda values: sum(v for v in values if v is not None),
+    "$multiply": _product,
+    "$concat": lambda values: None if any(v is None for v in values) else "".join(values),
+    "$concatArrays": lambda values: None if any(v is None for v in values) else
+    [item for v in values for item in v],
+    "$setUnion": lambda values: list({_freeze(item): item for v in values
+                                      for item in (v or [])}.values()),
+}
+
+
+def compile_expression(expr: Any) -> Callable[[dict], Any]:
+    """Turn an aggregation expression into a function of one document.
+
+    Pipelines compile each expression once per stage instead of
+    re-interpreting it for every document.
+    """
+    if isinstance(expr, str) and expr.startswith("$"):
+        if expr == "$$ROOT":
+            return lambda doc: doc
+        return _field_getter(expr[1:])
+    if isinstance(expr, list):
+        items = [compile_expression(e) for e in expr]
+        return lambda doc: [fn(doc) for fn in items]
+    if not isinstance(expr, dict):
+        return lambda doc: expr
+    if not _is_operator_doc(expr):
+        fields = [(k, compile_expression(v)) for k, v in expr.items()]
+        return lambda doc: {k: fn(doc) for k, fn in fields}
+
+    (op, arg), = expr.items()
+    if op == "$literal":
+        return lambda doc: arg
+    if op == "$dateToString":
+        date_fn = compile_expression(arg["date"])
+        fmt = arg.get("format", "%Y-%m-%dT%H:%M:%S.%LZ").replace("%L", "000")
+
+        def date_to_string(doc):
+            value = date_fn(doc)
+            return value.strftime(fmt) if isinstance(value, datetime) else None
+        return date_to_string
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg["if"], arg["then"], arg["else"]]
+        cond_fn, then_fn, else_fn = (compile_expression(a) for a in arg)
+        return lambda doc: then_fn(doc) if cond_fn(doc) else else_fn(doc)
+    if op == "$ifNull":
+        options = [compile_expression(e) for e in arg]
+
+        def if_null(doc):
+            for fn in options:
+                value = fn(doc)
+                if value is not None:
+                    return value
+            return None
+        return if_null
+
+    args = [compile_expression(a) for a in (arg if isinstance(arg, list) else [arg])]
+    if op in _BINARY_OPS:
+        fn, (left, right) = _BINARY_OPS[op], args
+        return lambda doc: fn(left(doc), right(doc))
+    if op in _UNARY_OPS:
+        fn, (operand,) = _UNARY_OPS[op], args[:1]
+        return lambda doc: fn(operand(doc))
+    if op in _VARIADIC_OPS:
+        fn = _VARIADIC_OPS[op]
+        return lambda doc: fn([a(doc) for a in args])
+    raise OperationFailure(f"Unsupported expression {op} in memory engine")
+
+
+def evaluate(expr: Any, doc: dict) -> Any:
+    return compile_expression(expr)(doc)
+
+
+class _Accumulator:
+    """Running state of one $group accumulator, folded one document at a time."""
+
+    def __init__(self, op: str, arg_fn: Callable[[dict], Any]):
+        self.op = op
+        self.arg_fn = arg_fn
+        self.values = []
+        self.count = 0
+        self.total = 0
+        self.seen = set()
+
+    def add(self, doc: dict) -> None:
+        op = self.op
+        if op == "$count":
+            self.count += 1
+            return
+        value = self.arg_fn(doc)
+        if op == "$sum" or op == "$avg":
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.total += value
+                self.count += 1
+        elif op == "$addToSet":
+            frozen = _freeze(value)
+            if frozen not in self.seen:
+                self.seen.add(frozen)
+                self.values.append(value)
+        elif op in ("$min", "$max"):
+            if value is not None:
+                self.values.append(value)
+        else:
+            self.values.append(value)
+
+    def result(self) -> Any:
+        op = self.op
+        if op == "$count":
+            return self.count
+        if op == "$sum":
+            return self.total
+        if op == "$avg":
+            return self.total / self.count if self.count else None
+        if op == "$min":
+            return min(self.values) if self.values else None
+        if op == "$max":
+            return max(self.values) if self.values else None
+        if op == "$first":
+            return self.values[0] if self.values else None
+        if op == "$last":
+            return self.values[-1] if self.values else None
+        return self.values
+
+
+_ACCUMULATORS = {"$sum", "$avg", "$min", "$max", "$first", "$last",
+                 "$push", "$addToSet", "$count"}
+
+
+def _group(docs: List[dict], spec: dict) -> List[dict]:
+    key_fn = compile_expression(spec["_id"])
+    accumulators = []
+    for field, acc in spec.items():
+        if field == "_id":
+            continue
+        (op, arg), = acc.items()
+        if op not in _ACCUMULATORS:
+            raise OperationFailure(f"Unsupported accumulator {op} in memory engine")
+        accumulators.append((field, op, compile_expression(arg)))
+
+    groups: Dict[Any, Tuple[Any, list]] = {}
+    for d in docs:
+        key = key_fn(d)
+        frozen = _freeze(key)
+        group = groups.get(frozen)
+        if group is None:
+            group = groups[frozen] = (key, [_Accumulator(op, fn) for _, op, fn in accumulators])
+        for state in group[1]:
+            state.add(d)
+
+    return [{"_id": key, **{field: state.result()
+                            for (field, _, _), state in zip(accumulators, states)}}
+            for key, states in groups.values()]
+
+
+def _sort_key(value: Any):
+    # MongoDB orders missing/null before any other value
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (3, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (4, value.binary)
+    if isinstance(value, datetime):
+        return (5, value)
+    if isinstance(value, dict):
+        # Embedded documents compare field by field, as in MongoDB
+        return (6, tuple((k, _sort_key(v)) for k, v in value.items()))
+    return (7, repr(value))
+
+
+def _normalize_sort(key_or_list, direction=None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+def sort_docs(docs: List[dict], spec: List[Tuple[str, int]]) -> List[dict]:
+    for field, direction in reversed(spec):
+        docs.sort(key=lambda d: _sort_key(_get(d, field)), reverse=direction < 0)
+    return docs
+
+
+def compile_projection(projection: Optional[dict]) -> Callable[[dict], dict]:
+    """Build a function applying ``projection``, so cursors parse it once."""
+    if not projection:
+        return _copy
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if all(not v for v in fields.values()):
+        def exclude(doc: dict) -> dict:
+            result = _copy(doc)
+            for field in fields:
+                _unset(result, field)
+            if not include_id:
+                result.pop("_id", None)
+            return result
+        return exclude
+
+    def include(doc: dict) -> dict:
+        result = {}
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for field, spec in fields.items():
+            if spec in (1, True):
+                if "." not in field:
+                    # Top-level fields skip the path walk; exports project millions
+                    if field in doc:
+                        result[field] = _copy(doc[field])
+                    continue
+                value = _get(doc, field)
+                if value is not _MISSING:
+                    _set(result, field, _copy(value))
+            else:
+                _set(result, field, evaluate(spec, doc))
+        return result
+    return include
+
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    return compile_projection(projection)(doc)
+
+
+def run_pipeline(docs: Iterable[dict], pipeline: List[dict]) -> List[dict]:
+    """Run ``pipeline`` without modifying the input documents.
+
+    Stages that change documents in place copy them first, so callers can
+    pass stored documents straight in and copy only the output.
+    """
+    docs = list(docs)
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [d for d in docs if match(d, spec)]
+        elif name == "$group":
+            docs = _group(docs, spec)
+        elif name == "$sort":
+            docs = sort_docs(docs, _normalize_sort(spec))
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$project":
+            docs = list(map(compile_projection(spec), docs))
+        elif name in ("$addFields", "$set"):
+            fields = [(field, compile_expression(expr)) for field, expr in spec.items()]
+            docs = [_copy(d) for d in docs]
+            for d in docs:
+                for field, fn in fields:
+                    _set(d, field, fn(d))
+        elif name == "$unset":
+            docs = [_copy(d) for d in docs]
+            for d in docs:
+                for field in ([spec] if isinstance(spec, str) else spec):
+                    _unset(d, field)
+        elif name == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        elif name == "$unwind":
+            path = spec if isinstance(spec, str) else spec["path"]
+            field = path[1:]
+            docs = [{**d, field: item}
+                    for d in docs for item in (_get(d, field) or [])]
+        elif name == "$facet":
+            docs = [{field: run_pipeline(docs, sub) for field, sub in spec.items()}]
+        else:
+            raise OperationFailure(f"Unsupported pipeline stage {name} in memory engine")
+    return docs
+
+
+# --- updates ----------------------------------------------------------------
+
+def apply_update(doc: dict, update: Any, inserting: bool = False) -> None:
+    if isinstance(update, list):
+        for stage in update:
+            (name, spec), = stage.items()
+            if name in ("$set", "$addFields"):
+                values = {field: evaluate(expr, doc) for field, expr in spec.items()}
+                for field, value in values.items():
+                    _set(doc, field, value)
+            elif name == "$unset":
+                for field in ([spec] if isinstance(spec, str) else spec):
+                    _unset(doc, field)
+            else:
+                raise OperationFailure(f"Unsupported update stage {name} in memory engine")
+        return
+
+    for op, fields in update.items():
+        if op == "$set":
+            for path, value in fields.items():
+                _set(doc, path, _copy(value))
+        elif op == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    _set(doc, path, _copy(value))
+        elif op == "$unset":
+            for path in fields:
+                _unset(doc, path)
+        elif op == "$rename":
+            for path, target in fields.items():
+                value = _get(doc, path)
+                if value is not _MISSING:
+                    _unset(doc, path)
+                    _set(doc, target, value)
+        elif op == "$inc":
+            for path, amount in fields.items():
+                current = _get(doc, path)
+                _set(doc, path, (0 if current is _MISSING else current) + amount)
+        elif op == "$max":
+            for path, value in fields.items():
+                current = _get(doc, path)
+                if current is _MISSING or value > current:
+                    _set(doc, path, value)
+        elif op == "$min":
+            for path, value in fields.items():
+                current = _get(doc, path)
+                if current is _MISSING or value < current:
+                    _set(doc, path, value)
+        elif op == "$push":
+            for path, value in fields.items():
+                current = _get(doc, path)
+                _set(doc, path, ([] if current is _MISSING else current) + [_copy(value)])
+        else:
+            raise OperationFailure(f"Unsupported update operator {op} in memory engine")
+
+
+# --- indexes ----------------------------------------------------------------
+
+class _Index:
+    def __init__(self, name: str, fields: List[Tuple[str, int]], unique: bool,
+                 partial: Optional[dict]):
+        self.name = name
+        self.fields = [f for f, _ in fields]
+        self.directions = [d for _, d in fields]
+        self.unique = unique
+        self.partial = partial
+        # Set once any indexed document holds an array, as in MongoDB
+        self.multikey = False
+        self.entries: Dict[tuple, set] = {}
+        # Distinct keys in ascending order, for sorted traversal, alongside
+        # their precomputed sort keys so bisection compares plain tuples.
+        # New keys wait in _unsorted until a sorted read needs them, so bulk
+        # inserts don't shift the whole list once per key.
+        self._ordered: List[tuple] = []
+        self.sort_keys: List[tuple] = []
+        self._unsorted: Dict[tuple, None] = {}
+
+    # Up to this many pending keys are bisected in; more trigger one merge sort
+    _INSORT_LIMIT = 64
+
+    @staticmethod
+    def _sortable(key: tuple) -> tuple:
+        return tuple(_sort_key(v) for v in key)
+
+    @property
+    def ordered(self) -> List[tuple]:
+        if self._unsorted:
+            added = sorted(((self._sortable(k), k) for k in self._unsorted),
+                           key=lambda pair: pair[0])
+            self._unsorted = {}
+            if len(added) <= self._INSORT_LIMIT:
+                for sortable, key in added:
+                    position = bisect_right(self.sort_keys, sortable)
+                    self.sort_keys.insert(position, sortable)
+                    self._ordered.insert(position, key)
+            else:
+                # Two sorted runs: Timsort merges them in linear time
+                merged = sorted(itertools.chain(zip(self.sort_keys, self._ordered), added),
+                                key=lambda pair: pair[0])
+                self.sort_keys = [sortable for sortable, _ in merged]
+                self._ordered = [key for _, key in merged]
+        return self._ordered
+
+    def keys(self, doc: dict) -> List[tuple]:
+        """Index keys of ``doc``; an array field contributes one key per element."""
+        if self.partial is not None and not match(doc, self.partial):
+            return []
+        values = []
+        for f in self.fields:
+            value = _get(doc, f)
+            if isinstance(value, list) and value:
+                self.multikey = True
+                values.append(list(dict.fromkeys(_freeze(v) for v in value)))
+            else:
+                values.append([_freeze(value)])
+        return list(itertools.product(*values))
+
+    def add(self, doc: dict) -> None:
+        for key in self.keys(doc):
+            bucket = self.entries.get(key)
+            if bucket is None:
+                bucket = self.entries[key] = set()
+                self._unsorted[key] = None
+            bucket.add(doc["_id"])
+
+    def remove(self, doc: dict) -> None:
+        for key in self.keys(doc):
+            bucket = self.entries.get(key)
+            if bucket is None:
+                continue
+            bucket.discard(doc["_id"])
+            if not bucket:
+                del self.entries[key]
+                if key in self._unsorted:
+                    del self._unsorted[key]
+                    continue
+                position = bisect_left(self.sort_keys, self._sortable(key))
+                while self._ordered[position] != key:
+                    position += 1
+                del self._ordered[position]
+                del self.sort_keys[position]
+
+    def prefix_ids(self, prefix: str) -> Iterable:
+        """Lazily yield ids whose first key field is a string starting with ``prefix``."""
+        ordered = self.ordered
+        position = bisect_left(self.sort_keys, (_sort_key(prefix),))
+        for key in itertools.islice(ordered, position, None):
+            if not (isinstance(key[0], str) and key[0].startswith(prefix)):
+                break
+            yield from self.entries[key]
+
+    def supports_sort(self, spec: List[Tuple[str, int]]) -> Optional[bool]:
+        """Whether the index yields ``spec`` order; returns the reverse flag or None.
+
+        ``ordered`` is ascending on every field whatever ``directions`` says,
+        so only all-ascending or all-descending sorts can walk it.
+        """
+        if self.partial is not None or self.multikey or len(spec) > len(self.fields):
+            return None
+        if [f for f, _ in spec] != self.fields[:len(spec)]:
+            return None
+        directions = {d for _, d in spec}
+        if directions == {1}:
+            return False
+        if directions == {-1}:
+            return True
+        return None
+
+    def covers(self, query: dict) -> bool:
+        """Whether every match of ``query`` is in this partial index.
+
+        Only ``{field: {"$exists": True}}`` filters are recognized, implied by
+        a non-null equality on that field; partial indexes otherwise only
+        enforce uniqueness.
+        """
+        for field, cond in self.partial.items():
+            if cond != {"$exists": True}:
+                return False
+            values = _equality_values(query.get(field, {}))
+            if not values or any(v is None for v in values):
+                return False
+        return True
+
+    def conflicts(self, doc: dict) -> bool:
+        if not self.unique:
+            return False
+        return any(_id != doc["_id"]
+                   for key in self.keys(doc) for _id in self.entries.get(key, ()))
+
+
+def _equality_values(cond: Any) -> Optional[list]:
+    """Values an index can look up for a filter condition, or None if it can't."""
+    if _is_operator_doc(cond):
+        if "$eq" in cond and len(cond) == 1:
+            return [cond["$eq"]]
+        if "$in" in cond and len(cond) == 1:
+            return list(cond["$in"])
+        return None
+    if isinstance(cond, (dict, list, re.Pattern)):
+        return None
+    return [cond]
+
+
+def _unique(ids: Iterable) -> Iterable:
+    seen = set()
+    for i in ids:
+        if i not in seen:
+            seen.add(i)
+            yield i
+
+
+def _regex_prefix(cond: Any) -> Optional[str]:
+    """Literal prefix of a ``^literal`` regex condition without flags, else None."""
+    if _is_operator_doc(cond) and set(cond) <= {"$regex", "$options"} and not cond.get("$options"):
+        pattern = cond["$regex"]
+    elif isinstance(cond, re.Pattern):
+        pattern = cond
+    else:
+        return None
+    if isinstance(pattern, re.Pattern):
+        if pattern.flags & re.IGNORECASE:
+            return None
+        pattern = pattern.pattern
+    if not pattern.startswith("^"):
+        return None
+    literal = re.match(r"(?:[^\\.^$*+?()\[\]{}|]|\\[^A-Za-z0-9])*", pattern[1:]).group()
+    if len(literal) != len(pattern) - 1:
+        return None
+    return re.sub(r"\\(.)", r"\1", literal)
+
+
+# --- cursors ----------------------------------------------------------------
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query: Optional[dict],
+                 projection: Optional[dict]):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[list] = None
+
+    def sort(self, key_or_list, direction=None) -> "MemoryCursor":
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, n: int) -> "MemoryCursor":
+        self._skip = n
+        return self
+
+    def limit(self, n: int) -> "MemoryCursor":
+        self._limit = n
+        return self
+
+    def batch_size(self, n: int) -> "MemoryCursor":
+        return self
+
+    def hint(self, index) -> "MemoryCursor":
+        return self
+
+    def _materialize(self) -> list:
+        if self._results is None:
+            docs = None
+            if self._sort and self._limit:
+                # Walk a sorted index and stop early instead of sorting everything
+                docs = self._collection._ordered_select(
+                    self._query, self._sort, self._skip + self._limit)
+            if docs is None:
+                docs = self._collection._select(self._query)
+                if self._sort:
+                    docs = sort_docs(docs, self._sort)
+            if self._skip:
+                docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = docs
+        return self._results
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        apply = compile_projection(self._projection)
+        for doc in self._materialize():
+            yield apply(doc)
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        if length and not self._limit and self._results is None:
+            # Let a bounded to_list use the same early-exit index walk as limit()
+            self._limit = length
+        docs = self._materialize()
+        if length is not None:
+            docs = docs[:length]
+        return list(map(compile_projection(self._projection), docs))
+
+
+class MemoryAggregateCursor:
+    def __init__(self, results: list):
+        self._results = results
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._results:
+            yield doc
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        return self._results if length is None else self._results[:length]
+
+
+# --- collection / database / client ----------------------------------------
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: Dict[Any, dict] = {}
+        self._indexes: Dict[str, _Index] = {}
+
+    # index management
+
+    async def create_index(self, keys, unique: bool = False,
+                           partialFilterExpression: Optional[dict] = None,
+                           name: Optional[str] = None, **kwargs) -> str:
+        fields = _normalize_sort(keys, 1)
+        name = name or "_".join(f"{f}_{d}" for f, d in fields)
+        if name in self._indexes:
+            return name
+        index = _Index(name, fields, unique, partialFilterExpression)
+        for doc in self._docs.values():
+            if index.conflicts(doc):
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {name}",
+                    code=11000)
+            index.add(doc)
+        self._indexes[name] = index
+        return name
+
+    async def index_information(self) -> dict:
+        info = {"_id_": {"key": [("_id", 1)]}}
+        for name, index in self._indexes.items():
+            info[name] = {"key": list(zip(index.fields, index.directions)),
+                          "unique": index.unique}
+            if index.partial is not None:
+                info[name]["partialFilterExpression"] = index.partial
+        return info
+
+    async def drop_index(self, name: str) -> None:
+        if name not in self._indexes:
+            raise OperationFailure(f"index not found with name [{name}]", code=27)
+        del self._indexes[name]
+
+    # query planning
+
+    def _select(self, query: dict, limit: Optional[int] = None) -> List[dict]:
+        """Return matching stored documents, using an index when one applies."""
+        candidates = self._candidates(query)
+        source = self._docs.values() if candidates is None else (
+            self._docs[i] for i in candidates if i in self._docs)
+        matched = (d for d in source if match(d, query))
+        return list(itertools.islice(matched, limit))
+
+    def _ordered_select(self, query: dict, spec: List[Tuple[str, int]],
+                        count: int) -> Optional[List[dict]]:
+        """First ``count`` matches in ``spec`` order via a sorted index, if usable."""
+        if self._candidates(query) is not None:
+            return None
+        for index in self._indexes.values():
+            reverse = index.supports_sort(spec)
+            if reverse is None:
+                continue
+            results = []
+            keys = reversed(index.ordered) if reverse else index.ordered
+            for key in keys:
+                bucket = [self._docs[i] for i in index.entries[key]]
+                matched = [d for d in bucket if match(d, query)]
+                if len(matched) > 1:
+                    matched = sort_docs(matched, spec)
+                results.extend(matched)
+                if len(results) >= count:
+                    break
+            return results
+        return None
+
+    def _candidates(self, query: dict) -> Optional[Iterable]:
+        if list(query) == ["$or"]:
+            # Union of per-branch lookups, only if every branch can use an index
+            ids = []
+            for branch in query["$or"]:
+                branch_ids = self._candidates(branch)
+                if branch_ids is None:
+                    return None
+                ids.extend(branch_ids)
+            return list(dict.fromkeys(ids))
+
+        if "_id" in query:
+            values = _equality_values(query["_id"])
+            if values is not None:
+                return [v for v in values if v in self._docs]
+
+        # Prefer the index covering the most equality-constrained fields
+        best = None
+        for index in self._indexes.values():
+            if not all(f in query for f in index.fields):
+                continue
+            values = [_equality_values(query[f]) for f in index.fields]
+            if any(v is None for v in values):
+                continue
+            if index.partial is not None and not index.covers(query):
+                continue
+            if best is None or len(index.fields) > len(best[0].fields):
+                best = (index, values)
+
+        if best is None:
+            return self._prefix_candidates(query)
+        index, values = best
+        ids = []
+        for key in itertools.product(*values):
+            ids.extend(index.entries.get(tuple(_freeze(k) for k in key), ()))
+        return list(dict.fromkeys(ids))
+
+    def _prefix_candidates(self, query: dict) -> Optional[Iterable]:
+        """Range-scan an index for an anchored, case-sensitive regex prefix."""
+        for index in self._indexes.values():
+            if index.partial is not None:
+                continue
+            prefix = _regex_prefix(query.get(index.fields[0]))
+            if prefix is not None:
+                return _unique(index.prefix_ids(prefix))
+        return None
+
+    # writes
+
+    def _check_unique(self, doc: dict) -> None:
+        for index in self._indexes.values():
+            if index.conflicts(doc):
+                message = (f"E11000 duplicate key error collection: {self.name} "
+                           f"index: {index.name}")
+                # Same detail fields the server reports, for callers that
+                # need to know which key collided
+                raise DuplicateKeyError(message, code=11000, details={
+                    "code": 11000, "errmsg": message,
+                    "keyPattern": dict(zip(index.fields, index.directions)),
+                    "keyValue": {f: _get(doc, f) for f in index.fields}})
+
+    def _store(self, doc: dict) -> None:
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_",
+                code=11000)
+        self._check_unique(doc)
+        self._docs[doc["_id"]] = doc
+        for index in self._indexes.values():
+            index.add(doc)
+
+    def _replace(self, old: dict, new: dict) -> None:
+        for index in self._indexes.values():
+            index.remove(old)
+        try:
+            self._check_unique(new)
+        except DuplicateKeyError:
+            for index in self._indexes.values():
+                index.add(old)
+            raise
+        self._docs[new["_id"]] = new
+        for index in self._indexes.values():
+            index.add(new)
+
+    def _remove(self, doc: dict) -> None:
+        for index in self._indexes.values():
+            index.remove(doc)
+        del self._docs[doc["_id"]]
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        self._store(_copy(document))
+        return InsertOneResult(document["_id"], True)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True,
+                          **kwargs) -> InsertManyResult:
+        errors = []
+        inserted = []
+        for i, document in enumerate(documents):
+            document.setdefault("_id", ObjectId())
+            try:
+                self._store(_copy(document))
+                inserted.append(document["_id"])
+            except DuplicateKeyError as e:
+                errors.append({"code": 11000, "errmsg": str(e), **(e.details or {}),
+                               "index": i, "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [],
+                                  "nInserted": len(inserted), "nUpserted": 0,
+                                  "nMatched": 0, "nModified": 0, "nRemoved": 0,
+                                  "upserted": []})
+        return InsertManyResult(inserted, True)
+
+    def _update(self, filter: dict, update: Any, many: bool, upsert: bool) -> UpdateResult:
+        matched = self._select(filter)
+        if not many:
+            matched = matched[:1]
+        modified = 0
+        for old in matched:
+            new = _copy(old)
+            apply_update(new, update)
+            if new != old:
+                self._replace(old, new)
+                modified += 1
+
+        raw = {"n": len(matched), "nModified": modified, "ok": 1.0}
+        if not matched and upsert:
+            doc = {k: v for k, v in filter.items()
+                   if not k.startswith("$") and not _is_operator_doc(v)}
+            apply_update(doc, update, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            self._store(doc)
+            raw.update({"n": 1, "upserted": doc["_id"]})
+        return UpdateResult(raw, True)
+
+    async def update_one(self, filter: dict, update: Any, upsert: bool = False,
+                         **kwargs) -> UpdateResult:
+        return self._update(filter, update, many=False, upsert=upsert)
+
+    async def update_many(self, filter: dict, update: Any, upsert: bool = False,
+                          **kwargs) -> UpdateResult:
+        return self._update(filter, update, many=True, upsert=upsert)
+
+    async def find_one_and_update(self, filter: dict, update: Any,
+                                  projection: Optional[dict] = None, sort=None,
+                                  upsert: bool = False,
+                                  return_document: bool = ReturnDocument.BEFORE,
+                                  **kwargs) -> Optional[dict]:
+        matched = self._select(filter)
+        if sort:
+            matched = sort_docs(matched, _normalize_sort(sort))
+        if not matched:
+            if not upsert:
+                return None
+            result = self._update(filter, update, many=False, upsert=True)
+            return project(self._docs[result.upserted_id], projection) \
+                if return_document == ReturnDocument.AFTER else None
+
+        old = matched[0]
+        new = _copy(old)
+        apply_update(new, update)
+        if new != old:
+            self._replace(old, new)
+        return project(new if return_document == ReturnDocument.AFTER else old, projection)
+
+    async def find_one_and_delete(self, filter: dict, projection: Optional[dict] = None,
+                                  sort=None, **kwargs) -> Optional[dict]:
+        matched = self._select(filter)
+        if sort:
+            matched = sort_docs(matched, _normalize_sort(sort))
+        if not matched:
+            return None
+        self._remove(matched[0])
+        return project(matched[0], projection)
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        matched = self._select(filter)[:1]
+        for doc in matched:
+            self._remove(doc)
+        return DeleteResult({"n": len(matched), "ok": 1.0}, True)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        matched = self._select(filter)
+        for doc in matched:
+            self._remove(doc)
+        return DeleteResult({"n": len(matched), "ok": 1.0}, True)
+
+    async def bulk_write(self, requests: list, ordered: bool = True,
+                         **kwargs) -> BulkWriteResult:
+        """InsertOne, UpdateOne/Many and DeleteOne/Many requests, in order."""
+        raw = {"writeErrors": [], "writeConcernErrors": [], "nInserted": 0,
+               "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0,
+               "upserted": []}
+        for i, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    await self.insert_one(request._doc)
+                    raw["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    result = self._update(request._filter, request._doc,
+                                          many=isinstance(request, UpdateMany),
+                                          upsert=bool(request._upsert))
+                    if result.upserted_id is not None:
+                        raw["nUpserted"] += 1
+                        raw["upserted"].append({"index": i, "_id": result.upserted_id})
+                    else:
+                        raw["nMatched"] += result.matched_count
+                        raw["nModified"] += result.modified_count
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    delete = self.delete_one if isinstance(request, DeleteOne) else self.delete_many
+                    raw["nRemoved"] += (await delete(request._filter)).deleted_count
+                else:
+                    raise OperationFailure(
+                        f"Unsupported bulk request {type(request).__name__} in memory engine")
+            except DuplicateKeyError as e:
+                raw["writeErrors"].append({"code": 11000, "errmsg": str(e),
+                                           **(e.details or {}), "index": i})
+                if ordered:
+                    break
+        if raw["writeErrors"]:
+            raise BulkWriteError(raw)
+        return BulkWriteResult(raw, True)
+
+    # reads
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None,
+             **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self, filter, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    async def find_one(self, filter: Optional[dict] = None,
+                       projection: Optional[dict] = None, **kwargs) -> Optional[dict]:
+        docs = await self.find(filter, projection, **kwargs).limit(1).to_list(1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        return len(self._select(filter))
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> MemoryAggregateCursor:
+        source = None
+        if pipeline and "$match" in pipeline[0]:
+            # A $limit right after the $match stops the scan early
+            limit = pipeline[1]["$limit"] if len(pipeline) > 1 and "$limit" in pipeline[1] else None
+            source = self._select(pipeline[0]["$match"], limit)
+            pipeline = pipeline[1:]
+        docs = self._docs.values() if source is None else source
+        # The pipeline runs on the stored documents; only the (usually much
+        # smaller) output is copied
+        return MemoryAggregateCursor([_copy(d) for d in run_pipeline(docs, pipeline)])
+
+    async def drop(self) -> None:
+        self._docs.clear()
+        self._indexes.clear()
+
+    def with_options(self, **kwargs) -> "MemoryCollection":
+        return self
+
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    async def drop_collection(self, name: str) -> None:
+        self._collections.pop(name, None)
+
+    async def command(self, command, **kwargs) -> dict:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"Command {name} is not supported by the memory engine")
+
+
+class MemoryClient:
+    """Stand-in for ``AsyncIOMotorClient`` backed by in-process collections."""
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path = snapshot_path
+        self._databases: Dict[str, MemoryDatabase] = {}
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self, name)
+        return self._databases[name]
+
+    def get_database(self, name: str, **kwargs) -> MemoryDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self["admin"]
+
+    async def drop_database(self, name: str) -> None:
+        self._databases.pop(name, None)
+
+    def load(self, path: str) -> None:
+        with open(path, "rb") as f:
+            for record in bson.decode_file_iter(f):
+                collection = self[record["d"]][record["c"]]
+                doc = record["doc"]
+                collection._docs[doc["_id"]] = doc
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for db_name, database in self._databases.items():
+                for coll_name, collection in database._collections.items():
+                    for doc in collection._docs.values():
+                        f.write(bson.encode({"d": db_name, "c": coll_name, "doc": doc}))
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        if self.snapshot_path:
+            self.save(self.snapshot_path)
@@ -86,8 +86,20 @@ class AttendanceCreate(BaseModel):
 
 
 class AttendanceUpdate(BaseModel):
-    status: Literal["Present",
-                    "Absent"] = Field(..., description="Attendance status")
+    status: Optional[Literal["Present",
+                             "Absent"]] = Field(None, description="Attendance status")
+    date: Optional[str] = Field(None, description="New date in YYYY-MM-DD format")
+
+    @field_validator('date')
+    @classmethod
+    def validate_date(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return v
+        try:
+            datetime.strptime(v, "%Y-%m-%d")
+            return v
+        except ValueError:
+            raise ValueError("Date must be in YYYY-MM-DD format")
 
 
 class EmployeeInfo(BaseModel):
@@ -0,0 +1,115 @@
+import asyncio
+from typing import FrozenSet
+
+from bson import ObjectId
+
+from config import get_settings
+from database import db, get_attendance_collection, get_employees_collection
+from deletions import record_deletions
+from rollups import delete_employee_rollups
+from versions import EMPLOYEES
+
+settings = get_settings()
+
+# Employees soft-deleted but not yet purged. Reads hide their attendance;
+# the purge worker empties it and removes the tombstone.
+_pending = set()
+_wake = asyncio.Event()
+
+NOT_DELETED = {"deletedAt": {"$exists": False}}
+
+
+def pending_employee_deletes() -> FrozenSet[ObjectId]:
+    return frozenset(_pending)
+
+
+def exclude_deleted_employees(query: dict) -> dict:
+    """Hide attendance of soft-deleted employees from an attendance filter."""
+    if not _pending:
+        return query
+    if "employeeId" not in query:
+        query["employeeId"] = {"$nin": list(_pending)}
+    elif query["employeeId"] in _pending:
+        query["employeeId"] = {"$in": []}
+    return query
+
+
+def schedule_purge(employee_id: ObjectId) -> None:
+    _pending.add(employee_id)
+    _wake.set()
+
+
+async def load_pending_deletes() -> None:
+    """Pick up tombstones left by an earlier run or another process."""
+    cursor = get_employees_collection().find(
+        {"deletedAt": {"$exists": True}}, {"_id": 1})
+    _pending.update([doc["_id"] async for doc in cursor])
+
+
+async def _delete_batch(ids: list, session=None) -> None:
+    await get_attendance_collection().delete_many(
+        {"_id": {"$in": ids}}, session=session)
+
+
+async def _remove_tombstone(employee_id: ObjectId, session=None) -> None:
+    await delete_employee_rollups(employee_id, session)
+    result = await get_employees_collection().delete_one(
+        {"_id": employee_id, "deletedAt": {"$exists": True}}, session=session)
+    if result.deleted_count:
+        # Sync clients drop the employee's attendance along with it
+        await record_deletions(EMPLOYEES, [employee_id], session)
+
+
+async def _finish_in_transaction(employee_id: ObjectId, ids: list) -> None:
+    """Delete the last batch and the tombstone atomically (replica sets only)."""
+    async with await db.client.start_session() as session:
+        async with session.start_transaction():
+            await _delete_batch(ids, session)
+            await _remove_tombstone(employee_id, session)
+
+
+async def purge_employee(employee_id: ObjectId) -> int:
+    """Delete an employee's attendance in throttled batches, then the tombstone."""
+    collection = get_attendance_collection()
+    batch_size = settings.employee_purge_batch_size
+    purged = 0
+    while True:
+        cursor = collection.find(
+            {"employeeId": employee_id}, {"_id": 1}).limit(batch_size)
+        ids = [doc["_id"] async for doc in cursor]
+
+        if len(ids) < batch_size and settings.employee_purge_transactions:
+            await _finish_in_transaction(employee_id, ids)
+            purged += len(ids)
+            break
+
+        if ids:
+            await _delete_batch(ids)
+            purged += len(ids)
+        if len(ids) < batch_size:
+            await _remove_tombstone(employee_id)
+            break
+        # Yield to request traffic between batches
+        await asyncio.sleep(settings.employee_purge_batch_delay)
+
+    _pending.discard(employee_id)
+    return purged
+
+
+async def employee_purger():
+    """Background worker draining soft-deleted employees; resumes after restarts."""
+    while True:
+        # Cleared before draining so a delete arriving mid-run wakes the next one
+        _wake.clear()
+        try:
+            await load_pending_deletes()
+            for employee_id in list(_pending):
+                purged = await purge_employee(employee_id)
+                print(f"Purged employee {employee_id} and {purged} attendance records.")
+        except Exception as e:
+            print(f"Employee purge warning: {e}")
+
+        try:
+            await asyncio.wait_for(_wake.wait(), settings.employee_purge_poll_interval)
+        except asyncio.TimeoutError:
+            pass
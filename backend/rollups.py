@@ -0,0 +1,229 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from database import get_attendance_collection, get_attendance_rollups_collection
+
+PRESENT = "Present"
+
+
+def month_key(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def shift_month(value: datetime, months: int) -> datetime:
+    """First day of the month ``months`` away from ``value``'s month."""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def next_month(value: datetime) -> datetime:
+    return shift_month(value, 1)
+
+
+def rate(present: int, total: int) -> float:
+    return round(present / total * 100, 1) if total > 0 else 0
+
+
+def week_key(iso_year: int, iso_week: int) -> str:
+    return f"{iso_year}-W{iso_week:02d}"
+
+
+def summarize_statuses(statuses: List[str]) -> dict:
+    """Counts plus the present-run shape needed to join periods into streaks.
+
+    ``headPresent``/``tailPresent`` are the runs of Present records at the
+    start and end of the period; ``longestPresent`` is the longest run inside it.
+    """
+    present = sum(1 for s in statuses if s == PRESENT)
+    head = 0
+    while head < len(statuses) and statuses[head] == PRESENT:
+        head += 1
+    tail = 0
+    while tail < len(statuses) and statuses[-1 - tail] == PRESENT:
+        tail += 1
+    longest = run = 0
+    for s in statuses:
+        run = run + 1 if s == PRESENT else 0
+        longest = max(longest, run)
+    return {
+        "present": present,
+        "absent": len(statuses) - present,
+        "total": len(statuses),
+        "headPresent": head,
+        "tailPresent": tail,
+        "longestPresent": longest,
+    }
+
+
+# Fields of a built rollup; a rollup without them is stale
+ROLLUP_FIELDS = tuple(summarize_statuses([]))
+
+
+def combine_streaks(periods: Iterable[dict]) -> dict:
+    """Fold chronologically ordered period summaries into overall streaks."""
+    longest = run = 0
+    for period in periods:
+        if not period["total"]:
+            continue
+        if period["absent"] == 0:
+            run += period["total"]
+        else:
+            longest = max(longest, run + period["headPresent"])
+            run = period["tailPresent"]
+        longest = max(longest, run, period["longestPresent"])
+    return {"current": run, "longest": longest}
+
+
+async def aggregate_periods(employee_id: ObjectId, start: datetime, end: datetime,
+                            group_key, analytics: bool = True) -> List[Tuple[object, dict]]:
+    """Summarize [start, end) per period with one pipeline on (employeeId, date).
+
+    Statuses are pushed in date order so streaks can be computed per period.
+    """
+    collection = get_attendance_collection(analytics=analytics)
+    pipeline = [
+        {"$match": {"employeeId": employee_id, "date": {"$gte": start, "$lt": end}}},
+        {"$sort": {"date": 1}},
+        {"$group": {"_id": group_key, "statuses": {"$push": "$status"}}},
+        {"$sort": {"_id": 1}},
+    ]
+    return [(row["_id"], summarize_statuses(row["statuses"]))
+            async for row in collection.aggregate(pipeline)]
+
+
+async def load_monthly_rollups(employee_id: ObjectId, months: List[str]) -> dict:
+    """Read rollups for closed ``months``, materializing any that are missing.
+
+    Each rollup document carries a ``generation`` that every write to its
+    month bumps. A rollup is saved only if its generation is unchanged since
+    it was read, so a write landing mid-build, from any process, is never
+    hidden by a stale rollup.
+    """
+    if not months:
+        return {}
+
+    rollups_collection = get_attendance_rollups_collection()
+    rollups = {}
+    generations = {}
+    async for doc in rollups_collection.find(
+            {"employeeId": employee_id, "month": {"$in": months}}, {"_id": 0}):
+        if "total" in doc:
+            rollups[doc["month"]] = doc
+        else:
+            generations[doc["month"]] = doc.get("generation")
+
+    missing = [m for m in months if m not in rollups]
+    if missing:
+        start = datetime.strptime(missing[0], "%Y-%m")
+        end = next_month(datetime.strptime(missing[-1], "%Y-%m"))
+        # Read from the primary: a lagging secondary would persist a stale rollup
+        computed = dict(await aggregate_periods(
+            employee_id, start, end,
+            {"$dateToString": {"format": "%Y-%m", "date": "$date"}}, analytics=False))
+        for month in missing:
+            summary = computed.get(month) or summarize_statuses([])
+            rollups[month] = {"employeeId": employee_id, "month": month, **summary}
+
+            generation = generations.get(month)
+            try:
+                await rollups_collection.update_one(
+                    {"employeeId": employee_id, "month": month,
+                     "generation": generation if generation is not None else {"$exists": False}},
+                    {"$set": {**summary, "updatedAt": datetime.utcnow()}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # Attendance for the month changed while we were reading it;
+                # the next request rebuilds from fresh data instead
+                pass
+    return rollups
+
+
+async def invalidate_monthly_rollups(changes: Iterable[Tuple[ObjectId, datetime]]) -> None:
+    """Mark rollups of closed months touched by a write stale; reads rebuild them.
+
+    The generation is bumped even where no rollup exists yet, so a build
+    already in progress for that month will not be saved. The current month
+    is always aggregated live, so the common case of marking today's
+    attendance costs nothing here.
+    """
+    current = month_key(datetime.utcnow())
+    keys = {(emp_id, month_key(d)) for emp_id, d in changes}
+    stale = [UpdateOne({"employeeId": emp_id, "month": month},
+                       {"$inc": {"generation": 1},
+                        "$unset": {field: "" for field in ROLLUP_FIELDS}},
+                       upsert=True)
+             for emp_id, month in keys if month < current]
+    if stale:
+        await get_attendance_rollups_collection().bulk_write(stale, ordered=False)
+
+
+async def delete_employee_rollups(employee_id: ObjectId, session=None) -> None:
+    await get_attendance_rollups_collection().delete_many(
+        {"employeeId": employee_id}, session=session)
+
+
+async def compute_employee_stats(employee_id: ObjectId, start: datetime, end: datetime,
+                                 granularity: str) -> dict:
+    """Attendance counts, rates and present streaks for days in [start, end)."""
+    if granularity == "week":
+        rows = await aggregate_periods(
+            employee_id, start, end,
+            {"year": {"$isoWeekYear": "$date"}, "week": {"$isoWeek": "$date"}})
+        periods = [(week_key(key["year"], key["week"]), summary) for key, summary in rows]
+    else:
+        periods = await monthly_periods(employee_id, start, end)
+
+    present = sum(p["present"] for _, p in periods)
+    total = sum(p["total"] for _, p in periods)
+
+    return {
+        "from": start.strftime("%Y-%m-%d"),
+        "to": (end - timedelta(days=1)).strftime("%Y-%m-%d"),
+        "granularity": granularity,
+        "totalPresent": present,
+        "totalAbsent": total - present,
+        "totalRecords": total,
+        "attendanceRate": rate(present, total),
+        "streaks": combine_streaks(p for _, p in periods),
+        "periods": [
+            {"period": key, "present": p["present"], "absent": p["absent"],
+             "total": p["total"], "attendanceRate": rate(p["present"], p["total"])}
+            for key, p in periods if p["total"]
+        ],
+    }
+
+
+async def monthly_periods(employee_id: ObjectId, start: datetime,
+                          end: datetime) -> List[Tuple[str, dict]]:
+    """Closed months fully inside the range come from rollups; the partial
+    edges and the current month are aggregated live."""
+    current_month = month_start(datetime.utcnow())
+    first_full = start if start.day == 1 else next_month(start)
+
+    closed = []
+    cursor = first_full
+    while next_month(cursor) <= end and cursor < current_month:
+        closed.append(cursor)
+        cursor = next_month(cursor)
+
+    month_group = {"$dateToString": {"format": "%Y-%m", "date": "$date"}}
+    if not closed:
+        return await aggregate_periods(employee_id, start, end, month_group)
+
+    head = await aggregate_periods(employee_id, start, closed[0], month_group) \
+        if start < closed[0] else []
+    rollups = await load_monthly_rollups(employee_id, [month_key(m) for m in closed])
+    tail_start = next_month(closed[-1])
+    tail = await aggregate_periods(employee_id, tail_start, end, month_group) \
+        if tail_start < end else []
+
+    return head + [(month_key(m), rollups[month_key(m)]) for m in closed] + tail
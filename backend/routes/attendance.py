@@ -1,45 +1,128 @@
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
-from datetime import datetime, date
-from typing import Optional
+from datetime import datetime, date, timedelta
+from typing import List, Literal, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
+from cache import employee_cache, summary_cache
 from database import get_attendance_collection, get_employees_collection
+from deletions import record_deletions
+from exporter import EXPORT_MEDIA_TYPES, stream_csv, stream_parquet
 from models import AttendanceCreate, AttendanceUpdate
+from purge import NOT_DELETED, exclude_deleted_employees, pending_employee_deletes
+from rollups import compute_employee_stats, invalidate_monthly_rollups, shift_month
+from serialization import bson_response, dumps
+from snapshots import employee_snapshot
+from versions import ATTENDANCES, EMPLOYEES, collection_versions, conditional_get
 
 router = APIRouter(prefix="/api/attendance", tags=["attendance"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+# Rows per cursor batch, employee join and Parquet row group in exports
+EXPORT_BATCH_SIZE = 5000
+EXPORT_PROJECTION = {"employeeId": 1, "employee": 1, "date": 1, "day": 1, "status": 1}
+
+# Matrix grouping fields, read from the embedded employee snapshot
+MATRIX_GROUP_FIELDS = {"department": "$employee.department"}
+MATRIX_DEFAULT_DAYS = 30
+MATRIX_MAX_DAYS = 366
+
+
+def parse_attendance_date(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d")
+
+
+def day_key(value: datetime) -> str:
+    """Normalized per-day key backing the unique (employeeId, day) index."""
+    return value.strftime("%Y-%m-%d")
+
 
 def serialize_attendance(attendance: dict) -> dict:
-    if attendance:
-        attendance["_id"] = str(attendance["_id"])
-        if "employeeId" in attendance and isinstance(attendance["employeeId"], ObjectId):
-            attendance["employeeId"] = str(attendance["employeeId"])
-        if "date" in attendance and isinstance(attendance["date"], datetime):
-            attendance["date"] = attendance["date"].isoformat().split("T")[0]
+    """Render ``date`` as YYYY-MM-DD; ObjectIds and timestamps are left to the encoder."""
+    if attendance and isinstance(attendance.get("date"), datetime):
+        attendance["date"] = attendance.get("day") or day_key(attendance["date"])
     return attendance
 
 
+EMPLOYEE_INFO_PROJECTION = {"fullName": 1, "employeeId": 1, "department": 1}
+
+
+def build_employee_info(employee: dict) -> dict:
+    return {
+        "_id": str(employee["_id"]),
+        "fullName": employee.get("fullName", ""),
+        "employeeId": employee.get("employeeId", ""),
+        "department": employee.get("department", "")
+    }
+
+
+async def load_employee_info(emp_ids) -> dict:
+    """Return employee info blocks by ObjectId, querying Mongo only for cache misses."""
+    emp_map = {}
+    missing = []
+    for eid in emp_ids:
+        info = employee_cache.get(eid)
+        if info is None:
+            missing.append(eid)
+        else:
+            emp_map[eid] = info
+
+    if missing:
+        employees_collection = get_employees_collection()
+        cursor = employees_collection.find(
+            {"_id": {"$in": missing}, **NOT_DELETED}, EMPLOYEE_INFO_PROJECTION)
+        async for emp in cursor:
+            info = build_employee_info(emp)
+            employee_cache.set(emp["_id"], info)
+            emp_map[emp["_id"]] = info
+
+    return emp_map
+
+
+async def load_live_employee_info(emp_oid: ObjectId) -> Optional[dict]:
+    """Info block of a live employee, read from the primary rather than the cache.
+
+    For existence checks: another worker may have deleted the employee since
+    this worker cached it.
+    """
+    emp = await get_employees_collection().find_one(
+        {"_id": emp_oid, **NOT_DELETED}, EMPLOYEE_INFO_PROJECTION)
+    if emp is None:
+        employee_cache.invalidate(emp_oid)
+        return None
+    info = build_employee_info(emp)
+    employee_cache.set(emp_oid, info)
+    return info
+
+
 async def populate_employees(records: list) -> list:
-    """Batch-load employee info for attendance records (avoids N+1 queries)."""
+    """Batch-load employee info for attendance records (avoids N+1 queries).
+
+    Records carrying an embedded ``employee`` snapshot are expanded in place;
+    only older records without one fall back to the employee cache.
+    """
     if not records:
         return records
 
-    employees_collection = get_employees_collection()
+    for record in records:
+        snapshot = record.pop("employee", None)
+        eid = record.get("employeeId")
+        if snapshot is not None and isinstance(eid, ObjectId):
+            record["employeeId"] = {"_id": str(eid), **snapshot}
+
     emp_ids = list({r["employeeId"]
                    for r in records if isinstance(r.get("employeeId"), ObjectId)})
 
     if not emp_ids:
         return records
 
-    cursor = employees_collection.find({"_id": {"$in": emp_ids}})
-    emp_map = {}
-    async for emp in cursor:
-        emp_map[emp["_id"]] = {
-            "_id": str(emp["_id"]),
-            "fullName": emp.get("fullName", ""),
-            "employeeId": emp.get("employeeId", ""),
-            "department": emp.get("department", "")
-        }
+    emp_map = await load_employee_info(emp_ids)
 
     for record in records:
         eid = record.get("employeeId")
@@ -49,40 +132,157 @@ async def populate_employees(records: list) -> list:
     return records
 
 
+def to_ndjson(records: list) -> bytes:
+    return b"".join(dumps(serialize_attendance(rec)) + b"\n" for rec in records)
+
+
+async def populated_batches(cursor, size: int):
+    """Yield lists of ``size`` records with employee info joined per batch."""
+    batch = []
+    async for record in cursor:
+        batch.append(record)
+        if len(batch) >= size:
+            yield await populate_employees(batch)
+            batch = []
+
+    if batch:
+        yield await populate_employees(batch)
+
+
+async def stream_attendance(cursor):
+    """Yield NDJSON lines, joining employee info one batch at a time."""
+    async for batch in populated_batches(cursor, STREAM_BATCH_SIZE):
+        yield to_ndjson(batch)
+
+
+def export_row(record: dict) -> tuple:
+    employee = record.get("employeeId")
+    if not isinstance(employee, dict):
+        # Orphaned record whose employee no longer exists
+        employee = {}
+    return (record.get("day") or day_key(record["date"]),
+            employee.get("employeeId", ""), employee.get("fullName", ""),
+            employee.get("department", ""), record.get("status", ""))
+
+
+async def export_batches(cursor):
+    async for batch in populated_batches(cursor, EXPORT_BATCH_SIZE):
+        yield [export_row(record) for record in batch]
+
+
+async def compute_summary() -> dict:
+    """Count attendance by status in a single $group pass."""
+    attendance_collection = get_attendance_collection(analytics=True)
+    employees_collection = get_employees_collection(analytics=True)
+
+    # Tombstones awaiting purge are still in the collection
+    total_employees = await employees_collection.estimated_document_count() - \
+        len(pending_employee_deletes())
+
+    pipeline = [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+    match = exclude_deleted_employees({})
+    if match:
+        pipeline.insert(0, {"$match": match})
+
+    counts = {}
+    async for row in attendance_collection.aggregate(pipeline):
+        counts[row["_id"]] = row["count"]
+
+    total_records = sum(counts.values())
+    present_count = counts.get("Present", 0)
+    absent_count = counts.get("Absent", 0)
+
+    return {
+        "totalEmployees": total_employees,
+        "totalAttendanceRecords": total_records,
+        "totalPresent": present_count,
+        "totalAbsent": absent_count,
+        "attendanceRate": round((present_count / total_records * 100), 1) if total_records > 0 else 0
+    }
+
+
+async def compute_matrix(first_day: datetime, last_day: datetime, group_by: str) -> dict:
+    """Columnar present/absent counts per group per day from one $group pass."""
+    collection = get_attendance_collection(analytics=True)
+
+    dates = []
+    current = first_day
+    while current <= last_day:
+        dates.append(day_key(current))
+        current += timedelta(days=1)
+    positions = {d: i for i, d in enumerate(dates)}
+
+    series = {}
+    async for row in collection.aggregate([
+        {"$match": exclude_deleted_employees(
+            {"day": {"$gte": dates[0], "$lte": dates[-1]}})},
+        {"$group": {
+            "_id": {"day": "$day",
+                    "group": {"$ifNull": [MATRIX_GROUP_FIELDS[group_by], "Unassigned"]}},
+            "present": {"$sum": {"$cond": [{"$eq": ["$status", "Present"]}, 1, 0]}},
+            "absent": {"$sum": {"$cond": [{"$eq": ["$status", "Absent"]}, 1, 0]}}
+        }}
+    ]):
+        group = series.get(row["_id"]["group"])
+        if group is None:
+            group = series[row["_id"]["group"]] = {
+                "present": [0] * len(dates), "absent": [0] * len(dates)}
+        i = positions[row["_id"]["day"]]
+        group["present"][i] = row["present"]
+        group["absent"][i] = row["absent"]
+
+    return {
+        "from": dates[0],
+        "to": dates[-1],
+        "groupBy": group_by,
+        "dates": dates,
+        "groups": [{"key": key, **counts} for key, counts in sorted(series.items())]
+    }
+
+
 @router.get("")
 async def get_all_attendance(
+    request: Request,
+    response: Response,
     date_filter: Optional[str] = Query(None, alias="date"),
     employee_id: Optional[str] = Query(None, alias="employeeId"),
-    limit: Optional[int] = Query(None, alias="limit", ge=1, le=10000)
+    limit: Optional[int] = Query(None, alias="limit", ge=1, le=10000),
+    stream: bool = Query(False)
 ):
     try:
-        collection = get_attendance_collection()
+        not_modified = await conditional_get(request, response, ATTENDANCES, EMPLOYEES)
+        if not_modified:
+            return not_modified
+
+        collection = get_attendance_collection(analytics=True)
 
         query = {}
         if date_filter:
             try:
-                filter_date = datetime.fromisoformat(
-                    date_filter.replace("Z", "+00:00"))
-                start_of_day = datetime(
-                    filter_date.year, filter_date.month, filter_date.day)
-                end_of_day = datetime(
-                    filter_date.year, filter_date.month, filter_date.day, 23, 59, 59)
-                query["date"] = {"$gte": start_of_day, "$lte": end_of_day}
+                query["day"] = day_key(parse_attendance_date(date_filter))
             except ValueError:
                 pass
 
         if employee_id and ObjectId.is_valid(employee_id):
             query["employeeId"] = ObjectId(employee_id)
 
-        cursor = collection.find(query).sort("date", -1)
+        cursor = collection.find(exclude_deleted_employees(query)).sort("date", -1)
+
+        if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+            cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+            if limit:
+                cursor = cursor.limit(limit)
+            return StreamingResponse(stream_attendance(cursor),
+                                     media_type=NDJSON_MEDIA_TYPE)
+
         records = await cursor.to_list(length=limit or 10000)
 
         await populate_employees(records)
 
-        return {
+        return bson_response({
             "success": True,
             "data": [serialize_attendance(rec) for rec in records]
-        }
+        }, response)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -92,26 +292,21 @@ async def get_all_attendance(
 
 
 @router.get("/summary")
-async def get_attendance_summary():
+async def get_attendance_summary(request: Request, response: Response):
     try:
-        attendance_collection = get_attendance_collection()
-        employees_collection = get_employees_collection()
+        not_modified = await conditional_get(request, response, ATTENDANCES, EMPLOYEES)
+        if not_modified:
+            return not_modified
 
-        total_employees = await employees_collection.count_documents({})
-        total_records = await attendance_collection.count_documents({})
-        present_count = await attendance_collection.count_documents({"status": "Present"})
-        absent_count = await attendance_collection.count_documents({"status": "Absent"})
+        summary = summary_cache.get("summary")
+        if summary is None:
+            summary = await compute_summary()
+            summary_cache.set("summary", summary)
 
-        return {
+        return bson_response({
             "success": True,
-            "data": {
-                "totalEmployees": total_employees,
-                "totalAttendanceRecords": total_records,
-                "totalPresent": present_count,
-                "totalAbsent": absent_count,
-                "attendanceRate": round((present_count / total_records * 100), 1) if total_records > 0 else 0
-            }
-        }
+            "data": summary
+        }, response)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -120,9 +315,120 @@ async def get_attendance_summary():
         )
 
 
+@router.get("/matrix")
+async def get_attendance_matrix(
+    request: Request,
+    response: Response,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    group_by: Literal["department"] = Query("department", alias="groupBy")
+):
+    """Per-group × per-day attendance counts for heatmaps.
+
+    ``dates`` holds every day in range; each group's ``present`` and
+    ``absent`` arrays line up with it. Defaults to the 30 days ending today.
+    """
+    try:
+        not_modified = await conditional_get(request, response, ATTENDANCES, EMPLOYEES)
+        if not_modified:
+            return not_modified
+
+        try:
+            last_day = datetime.strptime(date_to, "%Y-%m-%d") if date_to else \
+                datetime.combine(datetime.utcnow().date(), datetime.min.time())
+            first_day = datetime.strptime(date_from, "%Y-%m-%d") if date_from else \
+                last_day - timedelta(days=MATRIX_DEFAULT_DAYS - 1)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"success": False,
+                        "message": "Dates must be in YYYY-MM-DD format"}
+            )
+
+        if first_day > last_day:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"success": False,
+                        "message": "'from' must not be after 'to'"}
+            )
+        if (last_day - first_day).days >= MATRIX_MAX_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"success": False,
+                        "message": f"Date range must not exceed {MATRIX_MAX_DAYS} days"}
+            )
+
+        cache_key = ("matrix", day_key(first_day), day_key(last_day), group_by)
+        matrix = summary_cache.get(cache_key)
+        if matrix is None:
+            matrix = await compute_matrix(first_day, last_day, group_by)
+            summary_cache.set(cache_key, matrix)
+
+        return bson_response({
+            "success": True,
+            "data": matrix
+        }, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"success": False,
+                    "message": "Failed to fetch attendance matrix", "error": str(e)}
+        )
+
+
+@router.get("/export")
+async def export_attendance(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    format: Literal["csv", "parquet"] = Query("csv")
+):
+    """Stream attendance for days in [from, to] as a CSV or Parquet download.
+
+    Defaults to the month to date. Records are read in date order from a
+    projected cursor and written out batch by batch, so the range is unbounded.
+    """
+    try:
+        last_day = datetime.strptime(date_to, "%Y-%m-%d") if date_to else \
+            datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        first_day = datetime.strptime(date_from, "%Y-%m-%d") if date_from else \
+            last_day.replace(day=1)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"success": False,
+                    "message": "Dates must be in YYYY-MM-DD format"}
+        )
+
+    if first_day > last_day:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"success": False,
+                    "message": "'from' must not be after 'to'"}
+        )
+
+    query = exclude_deleted_employees({
+        "date": {"$gte": first_day, "$lt": last_day + timedelta(days=1)}})
+    cursor = get_attendance_collection(analytics=True).find(query, EXPORT_PROJECTION) \
+        .sort("date", 1).batch_size(EXPORT_BATCH_SIZE)
+
+    writer = stream_parquet if format == "parquet" else stream_csv
+    filename = f"attendance-{day_key(first_day)}-to-{day_key(last_day)}.{format}"
+    return StreamingResponse(
+        writer(export_batches(cursor)),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/employee/{employee_id}")
-async def get_employee_attendance(employee_id: str):
+async def get_employee_attendance(employee_id: str, request: Request, response: Response):
     try:
+        not_modified = await conditional_get(request, response, ATTENDANCES, EMPLOYEES)
+        if not_modified:
+            return not_modified
+
         if not ObjectId.is_valid(employee_id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -130,11 +436,10 @@ async def get_employee_attendance(employee_id: str):
                         "message": "Invalid employee ID format"}
             )
 
-        collection = get_attendance_collection()
-        employees_collection = get_employees_collection()
+        collection = get_attendance_collection(analytics=True)
 
-        employee = await employees_collection.find_one({"_id": ObjectId(employee_id)})
-        if not employee:
+        emp_info = await load_live_employee_info(ObjectId(employee_id))
+        if not emp_info:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={"success": False, "message": "Employee not found"}
@@ -146,20 +451,13 @@ async def get_employee_attendance(employee_id: str):
 
         total_present = sum(1 for r in records if r.get("status") == "Present")
 
-        emp_info = {
-            "_id": str(employee["_id"]),
-            "fullName": employee.get("fullName", ""),
-            "employeeId": employee.get("employeeId", ""),
-            "department": employee.get("department", "")
-        }
-        for record in records:
-            record["employeeId"] = emp_info
+        await populate_employees(records)
 
-        return {
+        return bson_response({
             "success": True,
             "data": [serialize_attendance(rec) for rec in records],
             "totalPresent": total_present
-        }
+        }, response)
     except HTTPException:
         raise
     except Exception as e:
@@ -170,6 +468,76 @@ async def get_employee_attendance(employee_id: str):
         )
 
 
+@router.get("/employee/{employee_id}/stats")
+async def get_employee_attendance_stats(
+    employee_id: str,
+    request: Request,
+    response: Response,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    granularity: Literal["month", "week"] = Query("month")
+):
+    """Counts, rates and present streaks for one employee, computed server-side.
+
+    Defaults to the twelve months ending with ``to`` (today if omitted).
+    Streaks count consecutive Present records, so unmarked days don't break them.
+    """
+    try:
+        not_modified = await conditional_get(request, response, ATTENDANCES, EMPLOYEES)
+        if not_modified:
+            return not_modified
+
+        if not ObjectId.is_valid(employee_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"success": False,
+                        "message": "Invalid employee ID format"}
+            )
+
+        try:
+            last_day = datetime.strptime(date_to, "%Y-%m-%d") if date_to else \
+                datetime.combine(datetime.utcnow().date(), datetime.min.time())
+            first_day = datetime.strptime(date_from, "%Y-%m-%d") if date_from else \
+                shift_month(last_day, -11)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"success": False,
+                        "message": "Dates must be in YYYY-MM-DD format"}
+            )
+
+        if first_day > last_day:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"success": False,
+                        "message": "'from' must not be after 'to'"}
+            )
+
+        emp_oid = ObjectId(employee_id)
+        emp_info = await load_live_employee_info(emp_oid)
+        if not emp_info:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"success": False, "message": "Employee not found"}
+            )
+
+        stats = await compute_employee_stats(
+            emp_oid, first_day, last_day + timedelta(days=1), granularity)
+
+        return bson_response({
+            "success": True,
+            "data": {"employee": emp_info, **stats}
+        }, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"success": False,
+                    "message": "Failed to fetch attendance statistics", "error": str(e)}
+        )
+
+
 @router.get("/{attendance_id}")
 async def get_attendance(attendance_id: str):
     try:
@@ -181,7 +549,8 @@ async def get_attendance(attendance_id: str):
             )
 
         collection = get_attendance_collection()
-        record = await collection.find_one({"_id": ObjectId(attendance_id)})
+        record = await collection.find_one(
+            exclude_deleted_employees({"_id": ObjectId(attendance_id)}))
 
         if not record:
             raise HTTPException(
@@ -192,10 +561,10 @@ async def get_attendance(attendance_id: str):
 
         await populate_employees([record])
 
-        return {
+        return bson_response({
             "success": True,
             "data": serialize_attendance(record)
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -210,7 +579,6 @@ async def get_attendance(attendance_id: str):
 async def create_attendance(attendance: AttendanceCreate):
     try:
         collection = get_attendance_collection()
-        employees_collection = get_employees_collection()
 
         if not ObjectId.is_valid(attendance.employeeId):
             raise HTTPException(
@@ -219,60 +587,47 @@ async def create_attendance(attendance: AttendanceCreate):
                         "message": "Invalid employee ID format"}
             )
 
-        employee = await employees_collection.find_one({"_id": ObjectId(attendance.employeeId)})
-        if not employee:
+        emp_info = await load_live_employee_info(ObjectId(attendance.employeeId))
+        if not emp_info:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={"success": False, "message": "Employee not found"}
             )
 
-        try:
-            attendance_date = datetime.fromisoformat(
-                attendance.date.replace("Z", "+00:00"))
-        except ValueError:
-            attendance_date = datetime.strptime(attendance.date, "%Y-%m-%d")
-
-        start_of_day = datetime(attendance_date.year,
-                                attendance_date.month, attendance_date.day)
-        end_of_day = datetime(
-            attendance_date.year, attendance_date.month, attendance_date.day, 23, 59, 59)
-
-        existing = await collection.find_one({
-            "employeeId": ObjectId(attendance.employeeId),
-            "date": {"$gte": start_of_day, "$lte": end_of_day}
-        })
-
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail={
-                    "success": False, "message": "Attendance already marked for this employee on this date"}
-            )
+        attendance_date = parse_attendance_date(attendance.date)
 
         now = datetime.utcnow()
         attendance_doc = {
             "employeeId": ObjectId(attendance.employeeId),
             "date": attendance_date,
+            "day": day_key(attendance_date),
             "status": attendance.status,
+            "employee": employee_snapshot(emp_info),
             "createdAt": now,
             "updatedAt": now
         }
 
-        result = await collection.insert_one(attendance_doc)
+        # The unique (employeeId, day) index rejects a second mark atomically
+        try:
+            result = await collection.insert_one(attendance_doc)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "success": False, "message": "Attendance already marked for this employee on this date"}
+            )
         attendance_doc["_id"] = result.inserted_id
+        summary_cache.invalidate()
+        await collection_versions.bump(ATTENDANCES)
+        await invalidate_monthly_rollups([(attendance_doc["employeeId"], attendance_date)])
 
-        attendance_doc["employeeId"] = {
-            "_id": str(employee["_id"]),
-            "fullName": employee.get("fullName", ""),
-            "employeeId": employee.get("employeeId", ""),
-            "department": employee.get("department", "")
-        }
+        await populate_employees([attendance_doc])
 
-        return {
+        return bson_response({
             "success": True,
             "message": "Attendance recorded successfully",
             "data": serialize_attendance(attendance_doc)
-        }
+        }, status_code=status.HTTP_201_CREATED)
     except HTTPException:
         raise
     except Exception as e:
@@ -283,24 +638,111 @@ async def create_attendance(attendance: AttendanceCreate):
         )
 
 
-@router.put("/{attendance_id}")
-async def update_attendance(attendance_id: str, attendance: AttendanceUpdate):
+@router.post("/bulk")
+async def create_attendance_bulk(records: List[AttendanceCreate]):
+    """Mark attendance for many employees with one lookup and one unordered insert."""
     try:
-        if not ObjectId.is_valid(attendance_id):
+        if not records:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail={"success": False,
-                        "message": "Invalid attendance ID format"}
+                        "message": "No attendance records provided"}
             )
 
         collection = get_attendance_collection()
+        employees_collection = get_employees_collection()
+
+        emp_ids = {ObjectId(r.employeeId)
+                   for r in records if ObjectId.is_valid(r.employeeId)}
+        snapshots = {}
+        async for emp in employees_collection.find(
+                {"_id": {"$in": list(emp_ids)}, **NOT_DELETED}, EMPLOYEE_INFO_PROJECTION):
+            snapshots[emp["_id"]] = employee_snapshot(emp)
+
+        results = [None] * len(records)
+        docs, doc_indexes = [], []
+        now = datetime.utcnow()
 
-        existing = await collection.find_one({"_id": ObjectId(attendance_id)})
-        if not existing:
+        for i, record in enumerate(records):
+            if not ObjectId.is_valid(record.employeeId):
+                results[i] = {"index": i, "status": "error",
+                              "message": "Invalid employee ID format"}
+                continue
+
+            emp_oid = ObjectId(record.employeeId)
+            if emp_oid not in snapshots:
+                results[i] = {"index": i, "status": "error",
+                              "message": "Employee not found"}
+                continue
+
+            attendance_date = parse_attendance_date(record.date)
+            docs.append({
+                "employeeId": emp_oid,
+                "date": attendance_date,
+                "day": day_key(attendance_date),
+                "status": record.status,
+                "employee": snapshots[emp_oid],
+                "createdAt": now,
+                "updatedAt": now
+            })
+            doc_indexes.append(i)
+
+        # Conflicts, including repeats within the batch, come back from the
+        # unique (employeeId, day) index as per-document write errors
+        failed_positions = {}
+        if docs:
+            try:
+                await collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                for err in e.details.get("writeErrors", []):
+                    failed_positions[err["index"]] = err
+            summary_cache.invalidate()
+            await collection_versions.bump(ATTENDANCES)
+            await invalidate_monthly_rollups(
+                (doc["employeeId"], doc["date"])
+                for pos, doc in enumerate(docs) if pos not in failed_positions)
+
+        for pos, i in enumerate(doc_indexes):
+            err = failed_positions.get(pos)
+            if err is None:
+                results[i] = {"index": i, "status": "created",
+                              "_id": str(docs[pos]["_id"])}
+            elif err.get("code") == 11000:
+                results[i] = {"index": i, "status": "conflict",
+                              "message": "Attendance already marked for this employee on this date"}
+            else:
+                results[i] = {"index": i, "status": "error",
+                              "message": err.get("errmsg", "Write failed")}
+
+        created = sum(1 for r in results if r["status"] == "created")
+
+        return bson_response({
+            "success": True,
+            "message": f"{created} of {len(records)} attendance records created",
+            "data": {
+                "created": created,
+                "failed": len(records) - created,
+                "results": results
+            }
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"success": False,
+                    "message": "Failed to create attendance records", "error": str(e)}
+        )
+
+
+@router.put("/{attendance_id}")
+async def update_attendance(attendance_id: str, attendance: AttendanceUpdate):
+    try:
+        if not ObjectId.is_valid(attendance_id):
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
+                status_code=status.HTTP_400_BAD_REQUEST,
                 detail={"success": False,
-                        "message": "Attendance record not found"}
+                        "message": "Invalid attendance ID format"}
             )
 
         update_data = {}
@@ -309,12 +751,8 @@ async def update_attendance(attendance_id: str, attendance: AttendanceUpdate):
             update_data["status"] = attendance.status
 
         if attendance.date is not None:
-            try:
-                update_data["date"] = datetime.fromisoformat(
-                    attendance.date.replace("Z", "+00:00"))
-            except ValueError:
-                update_data["date"] = datetime.strptime(
-                    attendance.date, "%Y-%m-%d")
+            update_data["date"] = parse_attendance_date(attendance.date)
+            update_data["day"] = day_key(update_data["date"])
 
         if not update_data:
             raise HTTPException(
@@ -324,29 +762,46 @@ async def update_attendance(attendance_id: str, attendance: AttendanceUpdate):
 
         update_data["updatedAt"] = datetime.utcnow()
 
-        await collection.update_one(
-            {"_id": ObjectId(attendance_id)},
-            {"$set": update_data}
-        )
+        collection = get_attendance_collection()
 
-        updated = await collection.find_one({"_id": ObjectId(attendance_id)})
+        # The pre-image carries the old date for rollup invalidation; applying
+        # the $set to it gives the updated record without another read.
+        # A date move onto a day already marked trips the unique (employeeId, day) index
+        try:
+            existing = await collection.find_one_and_update(
+                exclude_deleted_employees({"_id": ObjectId(attendance_id)}),
+                {"$set": update_data},
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "success": False, "message": "Attendance already marked for this employee on this date"}
+            )
 
-        if "employeeId" in updated:
-            employees_collection = get_employees_collection()
-            employee = await employees_collection.find_one({"_id": updated["employeeId"]})
-            if employee:
-                updated["employeeId"] = {
-                    "_id": str(employee["_id"]),
-                    "fullName": employee.get("fullName", ""),
-                    "employeeId": employee.get("employeeId", ""),
-                    "department": employee.get("department", "")
-                }
+        if existing is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"success": False,
+                        "message": "Attendance record not found"}
+            )
+
+        summary_cache.invalidate()
+        await collection_versions.bump(ATTENDANCES)
+        await invalidate_monthly_rollups(
+            (existing["employeeId"], d)
+            for d in (existing["date"], update_data.get("date", existing["date"])))
+
+        updated = {**existing, **update_data}
 
-        return {
+        await populate_employees([updated])
+
+        return bson_response({
             "success": True,
             "message": "Attendance updated successfully",
             "data": serialize_attendance(updated)
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -368,19 +823,26 @@ async def delete_attendance(attendance_id: str):
             )
 
         collection = get_attendance_collection()
-        result = await collection.delete_one({"_id": ObjectId(attendance_id)})
+        deleted = await collection.find_one_and_delete(
+            exclude_deleted_employees({"_id": ObjectId(attendance_id)}),
+            projection={"employeeId": 1, "date": 1})
 
-        if result.deleted_count == 0:
+        if deleted is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={"success": False,
                         "message": "Attendance record not found"}
             )
 
-        return {
+        summary_cache.invalidate()
+        await collection_versions.bump(ATTENDANCES)
+        await invalidate_monthly_rollups([(deleted["employeeId"], deleted["date"])])
+        await record_deletions(ATTENDANCES, [deleted["_id"]])
+
+        return bson_response({
             "success": True,
             "message": "Attendance record deleted successfully"
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
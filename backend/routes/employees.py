@@ -1,30 +1,112 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 from bson import ObjectId
 from datetime import datetime
-from typing import List
-
-from database import get_employees_collection, get_attendance_collection
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pydantic import ValidationError
+from typing import List, Literal, Optional
+import asyncio
+import base64
+import re
+
+from cache import employee_cache, summary_cache
+from database import (EMPLOYEE_SEARCH_KEYS_EXPRESSION, EMPLOYEE_UNIQUE_FIELDS,
+                      get_employees_collection)
+from importer import ImportFormatError, import_format, iter_batches, parse_rows
 from models import EmployeeCreate, EmployeeUpdate
+from purge import NOT_DELETED, schedule_purge
+from serialization import bson_response
+from snapshots import SNAPSHOT_FIELDS, employee_snapshot, schedule_snapshot_fan_out
+from versions import ATTENDANCES, EMPLOYEES, collection_versions, conditional_get
 
 router = APIRouter(prefix="/api/employees", tags=["employees"])
 
+# Internal fields kept off API responses
+EMPLOYEE_PROJECTION = {"searchKeys": 0}
+SEARCH_KEY_FIELDS = ("fullName", "employeeId", "email")
+# Matches scanned per search; facet counts cover at most this many
+SEARCH_SCAN_LIMIT = 1000
+# Rows validated and inserted per insert_many call during an import
+IMPORT_BATCH_SIZE = 1000
+# Failed rows listed in an import report; the failed count covers all of them
+IMPORT_MAX_ERRORS = 1000
+
+
+def employee_search_keys(employee: dict) -> list:
+    """Lowercased prefix-search terms: full name, each name word, employee ID and email.
+
+    Mirrors ``database.EMPLOYEE_SEARCH_KEYS_EXPRESSION``, used by pipeline updates.
+    """
+    name = employee.get("fullName", "").lower()
+    return list(dict.fromkeys([
+        name,
+        employee.get("employeeId", "").lower(),
+        employee.get("email", "").lower(),
+        *name.split(" ")
+    ]))
+
+
+def encode_cursor(employee: dict) -> str:
+    """Build an opaque keyset cursor from the last employee of a page."""
+    raw = f"{employee['createdAt'].isoformat()}|{employee['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
-def serialize_employee(employee: dict) -> dict:
-    if employee:
-        employee["_id"] = str(employee["_id"])
-    return employee
+
+def decode_cursor(cursor: str) -> dict:
+    """Turn a cursor back into a query resuming after the (createdAt, _id) key."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, oid = base64.urlsafe_b64decode(
+            padded.encode()).decode().split("|")
+        created_at = datetime.fromisoformat(created_at)
+        oid = ObjectId(oid)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"success": False, "message": "Invalid cursor"}
+        )
+    return {
+        "$or": [
+            {"createdAt": {"$lt": created_at}},
+            {"createdAt": created_at, "_id": {"$lt": oid}}
+        ]
+    }
 
 
 @router.get("")
-async def get_all_employees():
+async def get_all_employees(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None)
+):
     try:
-        collection = get_employees_collection()
-        cursor = collection.find().sort("createdAt", -1)
-        employees = await cursor.to_list(length=1000)
-        return {
+        not_modified = await conditional_get(request, response, EMPLOYEES)
+        if not_modified:
+            return not_modified
+
+        collection = get_employees_collection(analytics=True)
+
+        query = decode_cursor(after) if after else {}
+        query.update(NOT_DELETED)
+
+        # Fetch one extra row to know whether another page exists
+        cursor = collection.find(query, EMPLOYEE_PROJECTION).sort(
+            [("createdAt", -1), ("_id", -1)]).limit(limit + 1)
+        employees = await cursor.to_list(length=limit + 1)
+
+        next_cursor = None
+        if len(employees) > limit:
+            employees = employees[:limit]
+            next_cursor = encode_cursor(employees[-1])
+
+        return bson_response({
             "success": True,
-            "data": [serialize_employee(emp) for emp in employees]
-        }
+            "data": employees,
+            "nextCursor": next_cursor
+        }, response)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -33,6 +115,79 @@ async def get_all_employees():
         )
 
 
+@router.get("/search")
+async def search_employees(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    department: Optional[str] = Query(None),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """Case-insensitive prefix search on name, employee ID and email.
+
+    Department facet counts cover every match, ignoring the ``department``
+    filter, so the UI can show how many hits each department holds.
+    """
+    try:
+        # min_length is checked before stripping; a blank prefix would match everyone
+        q = q.strip()
+        if not q:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"success": False, "message": "Search query must not be blank"}
+            )
+
+        not_modified = await conditional_get(request, response, EMPLOYEES)
+        if not_modified:
+            return not_modified
+
+        collection = get_employees_collection(analytics=True)
+
+        # An anchored, case-sensitive regex on lowercased keys is an index range scan
+        prefix = re.escape(q.lower())
+        results_pipeline = [{"$match": {"department": department}}] if department else []
+        results_pipeline += [
+            {"$sort": {"fullName": 1, "_id": 1}},
+            {"$limit": limit},
+            {"$unset": list(EMPLOYEE_PROJECTION)}
+        ]
+
+        # Soft-deleted employees have no searchKeys, so they never match
+        cursor = collection.aggregate([
+            {"$match": {"searchKeys": {"$regex": f"^{prefix}"}}},
+            {"$limit": SEARCH_SCAN_LIMIT},
+            {"$facet": {
+                "results": results_pipeline,
+                "departments": [
+                    {"$group": {"_id": "$department", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1, "_id": 1}}
+                ]
+            }}
+        ])
+        facets = (await cursor.to_list(length=1))[0]
+        total = sum(row["count"] for row in facets["departments"])
+
+        return bson_response({
+            "success": True,
+            "data": facets["results"],
+            "facets": {
+                "department": [{"value": row["_id"], "count": row["count"]}
+                               for row in facets["departments"]]
+            },
+            "total": total,
+            # At the scan limit there may be more matches than were counted
+            "truncated": total >= SEARCH_SCAN_LIMIT
+        }, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"success": False,
+                    "message": "Failed to search employees", "error": str(e)}
+        )
+
+
 @router.get("/{employee_id}")
 async def get_employee(employee_id: str):
     try:
@@ -44,7 +199,8 @@ async def get_employee(employee_id: str):
             )
 
         collection = get_employees_collection()
-        employee = await collection.find_one({"_id": ObjectId(employee_id)})
+        employee = await collection.find_one(
+            {"_id": ObjectId(employee_id), **NOT_DELETED}, EMPLOYEE_PROJECTION)
 
         if not employee:
             raise HTTPException(
@@ -52,10 +208,10 @@ async def get_employee(employee_id: str):
                 detail={"success": False, "message": "Employee not found"}
             )
 
-        return {
+        return bson_response({
             "success": True,
-            "data": serialize_employee(employee)
-        }
+            "data": employee
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -66,47 +222,52 @@ async def get_employee(employee_id: str):
         )
 
 
+def duplicate_employee_message(details: dict, errmsg: str) -> str:
+    """Name the unique field (employeeId or email) a duplicate-key error hit."""
+    fields = set(details.get("keyPattern") or details.get("keyValue") or ())
+    if not fields:
+        # Older servers only name the index in the message
+        fields = {"email"} if "email_1" in errmsg else {"employeeId"}
+    return "Email already exists" if "email" in fields else "Employee ID already exists"
+
+
+def duplicate_employee_error(error: DuplicateKeyError) -> HTTPException:
+    """Map a unique-index violation on employeeId or email to its 400 response."""
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail={"success": False,
+                "message": duplicate_employee_message(error.details or {}, str(error))}
+    )
+
+
 @router.post("", status_code=status.HTTP_201_CREATED)
 async def create_employee(employee: EmployeeCreate):
     try:
         collection = get_employees_collection()
 
-        existing = await collection.find_one({
-            "$or": [
-                {"employeeId": employee.employeeId},
-                {"email": employee.email}
-            ]
-        })
-
-        if existing:
-            if existing.get("employeeId") == employee.employeeId:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail={"success": False,
-                            "message": "Employee ID already exists"}
-                )
-            if existing.get("email") == employee.email:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail={"success": False,
-                            "message": "Email already exists"}
-                )
-
         now = datetime.utcnow()
         employee_doc = {
             **employee.model_dump(),
             "createdAt": now,
             "updatedAt": now
         }
+        employee_doc["searchKeys"] = employee_search_keys(employee_doc)
 
-        result = await collection.insert_one(employee_doc)
+        # Unique indexes on employeeId and email reject duplicates atomically
+        try:
+            result = await collection.insert_one(employee_doc)
+        except DuplicateKeyError as e:
+            raise duplicate_employee_error(e)
         employee_doc["_id"] = result.inserted_id
+        del employee_doc["searchKeys"]
+        summary_cache.invalidate()
+        await collection_versions.bump(EMPLOYEES)
 
-        return {
+        return bson_response({
             "success": True,
             "message": "Employee created successfully",
-            "data": serialize_employee(employee_doc)
-        }
+            "data": employee_doc
+        }, status_code=status.HTTP_201_CREATED)
     except HTTPException:
         raise
     except Exception as e:
@@ -117,6 +278,126 @@ async def create_employee(employee: EmployeeCreate):
         )
 
 
+def validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first["loc"])
+    return f"{field}: {first['msg']}" if field else first["msg"]
+
+
+async def insert_import_batch(docs: List[dict], rows: List[int]) -> List[dict]:
+    """Insert one unordered batch and return the report entries of rows that failed.
+
+    Duplicates against existing employees and within the file both come back
+    from the unique indexes as per-document write errors.
+    """
+    if not docs:
+        return []
+    try:
+        await get_employees_collection().insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        return [{"row": rows[err["index"]],
+                 "message": duplicate_employee_message(err, err.get("errmsg", ""))
+                 if err.get("code") == 11000 else err.get("errmsg", "Write failed")}
+                for err in e.details.get("writeErrors", [])]
+    return []
+
+
+@router.post("/import")
+async def import_employees(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None)
+):
+    """Create employees from a streamed CSV or NDJSON request body.
+
+    The format comes from ``format`` or the Content-Type header. Rows are
+    validated with ``EmployeeCreate`` and inserted in unordered batches,
+    each overlapping with parsing of the next. Only failed rows are reported.
+    """
+    fmt = format or import_format(request.headers.get("content-type", ""))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail={"success": False,
+                    "message": "Upload must be text/csv or application/x-ndjson"}
+        )
+
+    total = failed = 0
+    errors = []
+    pending = None
+
+    def report(entries: List[dict]) -> None:
+        nonlocal failed
+        failed += len(entries)
+        errors.extend(entries[:IMPORT_MAX_ERRORS - len(errors)])
+
+    try:
+        async for batch in iter_batches(parse_rows(fmt, request.stream()), IMPORT_BATCH_SIZE):
+            now = datetime.utcnow()
+            docs, doc_rows, invalid = [], [], []
+            for row, raw in batch:
+                try:
+                    if isinstance(raw, str):
+                        raise ValueError(raw)
+                    doc = EmployeeCreate.model_validate(raw).model_dump()
+                except ValidationError as e:
+                    invalid.append({"row": row, "message": validation_message(e)})
+                    continue
+                except ValueError as e:
+                    invalid.append({"row": row, "message": str(e)})
+                    continue
+                doc["createdAt"] = doc["updatedAt"] = now
+                doc["searchKeys"] = employee_search_keys(doc)
+                docs.append(doc)
+                doc_rows.append(row)
+            total += len(batch)
+            report(invalid)
+
+            if pending is not None:
+                report(await pending)
+            pending = asyncio.ensure_future(insert_import_batch(docs, doc_rows))
+
+        if pending is not None:
+            report(await pending)
+            pending = None
+    except ImportFormatError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"success": False, "message": str(e)}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"success": False,
+                    "message": "Failed to import employees", "error": str(e)}
+        )
+    finally:
+        # Batches already sent stay imported even when the upload fails later
+        if pending is not None:
+            await asyncio.wait([pending])
+        if total:
+            summary_cache.invalidate()
+            await collection_versions.bump(EMPLOYEES)
+
+    if not total:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"success": False, "message": "No employees provided"}
+        )
+
+    created = total - failed
+    errors.sort(key=lambda entry: entry["row"])
+    return bson_response({
+        "success": True,
+        "message": f"{created} of {total} employees imported",
+        "data": {
+            "created": created,
+            "failed": failed,
+            "errors": errors,
+            "errorsTruncated": failed > len(errors)
+        }
+    })
+
+
 @router.put("/{employee_id}")
 async def update_employee(employee_id: str, employee: EmployeeUpdate):
     try:
@@ -127,15 +408,6 @@ async def update_employee(employee_id: str, employee: EmployeeUpdate):
                         "message": "Invalid employee ID format"}
             )
 
-        collection = get_employees_collection()
-
-        existing = await collection.find_one({"_id": ObjectId(employee_id)})
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail={"success": False, "message": "Employee not found"}
-            )
-
         update_data = {k: v for k, v in employee.model_dump().items()
                        if v is not None}
 
@@ -145,45 +417,43 @@ async def update_employee(employee_id: str, employee: EmployeeUpdate):
                 detail={"success": False, "message": "No fields to update"}
             )
 
-        if "employeeId" in update_data or "email" in update_data:
-            duplicate_query = {
-                "_id": {"$ne": ObjectId(employee_id)}, "$or": []}
-
-            if "employeeId" in update_data:
-                duplicate_query["$or"].append(
-                    {"employeeId": update_data["employeeId"]})
-            if "email" in update_data:
-                duplicate_query["$or"].append({"email": update_data["email"]})
-
-            if duplicate_query["$or"]:
-                duplicate = await collection.find_one(duplicate_query)
-                if duplicate:
-                    if duplicate.get("employeeId") == update_data.get("employeeId"):
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail={"success": False,
-                                    "message": "Employee ID already exists"}
-                        )
-                    if duplicate.get("email") == update_data.get("email"):
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail={"success": False,
-                                    "message": "Email already exists"}
-                        )
-
         update_data["updatedAt"] = datetime.utcnow()
-        await collection.update_one(
-            {"_id": ObjectId(employee_id)},
-            {"$set": update_data}
-        )
 
-        updated = await collection.find_one({"_id": ObjectId(employee_id)})
+        # One round trip: a pipeline update so searchKeys is rebuilt from the
+        # merged fields, with values wrapped in $literal so a leading "$" in
+        # user input is never read as a field path
+        pipeline = [{"$set": {k: {"$literal": v} for k, v in update_data.items()}}]
+        if any(field in update_data for field in SEARCH_KEY_FIELDS):
+            pipeline.append({"$set": {"searchKeys": EMPLOYEE_SEARCH_KEYS_EXPRESSION}})
+
+        collection = get_employees_collection()
+        try:
+            updated = await collection.find_one_and_update(
+                {"_id": ObjectId(employee_id), **NOT_DELETED},
+                pipeline,
+                projection=EMPLOYEE_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError as e:
+            raise duplicate_employee_error(e)
 
-        return {
+        if updated is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"success": False, "message": "Employee not found"}
+            )
+
+        employee_cache.invalidate(ObjectId(employee_id))
+        await collection_versions.bump(EMPLOYEES, ATTENDANCES)
+
+        if any(field in update_data for field in SNAPSHOT_FIELDS):
+            schedule_snapshot_fan_out(updated["_id"], employee_snapshot(updated))
+
+        return bson_response({
             "success": True,
             "message": "Employee updated successfully",
-            "data": serialize_employee(updated)
-        }
+            "data": updated
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -204,22 +474,34 @@ async def delete_employee(employee_id: str):
                         "message": "Invalid employee ID format"}
             )
 
+        # Tombstone the employee; its attendance is hidden from reads at once
+        # and purged in the background by purge.employee_purger. Its unique
+        # keys move under deleted.* so they can be reused right away.
         collection = get_employees_collection()
-        result = await collection.delete_one({"_id": ObjectId(employee_id)})
+        now = datetime.utcnow()
+        deleted = await collection.find_one_and_update(
+            {"_id": ObjectId(employee_id), **NOT_DELETED},
+            {"$set": {"deletedAt": now, "updatedAt": now},
+             "$unset": {"searchKeys": ""},
+             "$rename": {field: f"deleted.{field}" for field in EMPLOYEE_UNIQUE_FIELDS}},
+            projection={"_id": 1}
+        )
 
-        if result.deleted_count == 0:
+        if deleted is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={"success": False, "message": "Employee not found"}
             )
 
-        attendance_collection = get_attendance_collection()
-        await attendance_collection.delete_many({"employeeId": ObjectId(employee_id)})
+        schedule_purge(deleted["_id"])
+        employee_cache.invalidate(deleted["_id"])
+        summary_cache.invalidate()
+        await collection_versions.bump(EMPLOYEES, ATTENDANCES)
 
-        return {
+        return bson_response({
             "success": True,
             "message": "Employee deleted successfully"
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,51 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+import asyncio
+
+from config import get_settings
+from events import broker
+from serialization import dumps
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+settings = get_settings()
+
+# Browsers wait this long before reconnecting a dropped stream
+RETRY_MS = 3000
+
+
+def sse_message(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+async def event_stream():
+    queue = broker.subscribe()
+    try:
+        yield f"retry: {RETRY_MS}\n".encode() + sse_message("ready", {"mode": broker.mode})
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), settings.events_heartbeat_interval)
+            except asyncio.TimeoutError:
+                # Comment line keeping proxies from closing an idle stream
+                yield b": keep-alive\n\n"
+                continue
+            event = dict(event)
+            yield sse_message(event.pop("type"), event)
+    finally:
+        broker.unsubscribe(queue)
+
+
+@router.get("")
+async def stream_events():
+    """Server-Sent Events feed of employee and attendance changes.
+
+    ``change`` events carry ``collection`` and, when known, ``op``, ``id`` and
+    the changed fields; a bare ``collection`` means "refetch it". ``resync``
+    means events were dropped and everything should be refetched.
+    """
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
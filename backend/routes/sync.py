@@ -0,0 +1,134 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import base64
+
+from config import get_settings
+from database import (get_attendance_collection, get_deletions_collection,
+                      get_employees_collection)
+from purge import exclude_deleted_employees
+from routes.attendance import serialize_attendance
+from routes.employees import EMPLOYEE_PROJECTION
+from serialization import bson_response
+from versions import ATTENDANCES, EMPLOYEES
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+settings = get_settings()
+
+# Documents per collection per response; more are fetched with the next token
+SYNC_PAGE_SIZE = 5000
+# A caught-up token rewinds this far, so writes that committed slightly after
+# their updatedAt was stamped are sent on the next sync instead of skipped
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# One keyset position per change feed, in token order
+STREAMS = ("employees", "attendances", "deletions")
+
+Position = Tuple[Optional[datetime], Optional[ObjectId]]
+
+
+def encode_token(positions: dict) -> str:
+    parts = []
+    for name in STREAMS:
+        moment, oid = positions[name]
+        parts += [moment.isoformat() if moment else "", str(oid) if oid else ""]
+    return base64.urlsafe_b64encode("|".join(parts).encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        if len(parts) != 2 * len(STREAMS):
+            raise ValueError(token)
+        return {
+            name: (datetime.fromisoformat(parts[2 * i]) if parts[2 * i] else None,
+                   ObjectId(parts[2 * i + 1]) if parts[2 * i + 1] else None)
+            for i, name in enumerate(STREAMS)
+        }
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"success": False, "message": "Invalid sync token"}
+        )
+
+
+def changed_since(field: str, position: Position) -> dict:
+    """Filter for documents after ``position`` in (field, _id) order."""
+    moment, oid = position
+    if moment is None:
+        return {}
+    if oid is None:
+        return {field: {"$gte": moment}}
+    return {"$or": [{field: {"$gt": moment}}, {field: moment, "_id": {"$gt": oid}}]}
+
+
+async def read_changes(collection, query: dict, field: str, position: Position,
+                       caught_up: datetime, projection: Optional[dict] = None):
+    """One page of changes and the position the next sync resumes from."""
+    cursor = collection.find({**query, **changed_since(field, position)}, projection) \
+        .sort([(field, 1), ("_id", 1)]).limit(SYNC_PAGE_SIZE + 1)
+    docs = await cursor.to_list(length=SYNC_PAGE_SIZE + 1)
+    if len(docs) > SYNC_PAGE_SIZE:
+        docs = docs[:SYNC_PAGE_SIZE]
+        return docs, (docs[-1][field], docs[-1]["_id"]), True
+    return docs, (caught_up, None), False
+
+
+@router.get("")
+async def sync(since: Optional[str] = Query(None)):
+    """Employees and attendance created, updated or deleted after ``since``.
+
+    Without ``since`` everything is returned, page by page. Follow ``token``
+    while ``hasMore`` is true, then keep it for the next sync.
+    """
+    try:
+        positions = decode_token(since) if since else {name: (None, None) for name in STREAMS}
+
+        now = datetime.utcnow()
+        oldest = positions["deletions"][0]
+        if oldest is not None and oldest < now - timedelta(days=settings.sync_tombstone_days):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail={"success": False,
+                        "message": "Sync token expired; reload all data"}
+            )
+
+        # Primary reads only: a lagging secondary would let the token skip changes
+        caught_up = now - SYNC_OVERLAP
+        employees, positions["employees"], more_employees = await read_changes(
+            get_employees_collection(), {}, "updatedAt",
+            positions["employees"], caught_up, EMPLOYEE_PROJECTION)
+        attendance, positions["attendances"], more_attendance = await read_changes(
+            get_attendance_collection(), exclude_deleted_employees({}), "updatedAt",
+            positions["attendances"], caught_up, {"employee": 0})
+        deletions, positions["deletions"], more_deletions = await read_changes(
+            get_deletions_collection(), {}, "deletedAt",
+            positions["deletions"], caught_up)
+
+        deleted = {EMPLOYEES: [], ATTENDANCES: []}
+        for doc in deletions:
+            deleted.setdefault(doc["collection"], []).append(doc["documentId"])
+        # Soft-deleted employees are tombstones until the purge removes them
+        deleted[EMPLOYEES] += [e["_id"] for e in employees if "deletedAt" in e]
+
+        return bson_response({
+            "success": True,
+            "data": {
+                EMPLOYEES: [e for e in employees if "deletedAt" not in e],
+                ATTENDANCES: [serialize_attendance(a) for a in attendance],
+                "deleted": deleted
+            },
+            "token": encode_token(positions),
+            "hasMore": more_employees or more_attendance or more_deletions
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"success": False,
+                    "message": "Failed to sync changes", "error": str(e)}
+        )
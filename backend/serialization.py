@@ -0,0 +1,35 @@
+from typing import Any, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode BSON-shaped data (ObjectId, datetime) straight to JSON bytes."""
+    return orjson.dumps(content, default=_default,
+                        option=orjson.OPT_NON_STR_KEYS)
+
+
+class BSONJSONResponse(JSONResponse):
+    """JSON response rendered by orjson with native ObjectId/datetime support."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def bson_response(content: Any, response: Optional[Response] = None,
+                  status_code: int = 200) -> BSONJSONResponse:
+    """Build the response directly so FastAPI skips its jsonable_encoder pass.
+
+    Headers set on an injected ``response`` (e.g. ETag) are carried over.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return BSONJSONResponse(content, status_code=status_code, headers=headers)
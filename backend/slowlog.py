@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import uuid
+from contextvars import ContextVar
+
+from bson import json_util
+from pymongo import monitoring
+
+from config import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger("slow_query")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Client IDs are kept only when they are plain tokens; others get a new ID
+REQUEST_ID_PATTERN = re.compile(rb"[A-Za-z0-9._:-]+")
+
+# Correlation ID of the request being served; Motor copies the context into
+# its executor threads, so driver listeners see it too
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct",
+                        "findAndModify", "update", "delete"}
+# Session and routing fields the driver adds; explain rejects them
+DRIVER_FIELDS = {"lsid", "txnNumber", "$db", "$clusterTime", "$readPreference",
+                 "readConcern", "writeConcern", "autocommit", "startTransaction"}
+MAX_PENDING = 10000
+
+
+class RequestIdMiddleware:
+    """Assign each request a correlation ID and echo it in the response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode())
+        incoming = incoming[:64] if incoming else b""
+        request_id = incoming.decode() if REQUEST_ID_PATTERN.fullmatch(incoming) \
+            else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append(
+                    (REQUEST_ID_HEADER.lower().encode(), request_id.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Log commands slower than ``settings.slow_query_ms`` and sample their plans."""
+
+    def __init__(self):
+        self.threshold_micros = settings.slow_query_ms * 1000
+        self.loop = asyncio.get_running_loop()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE_COMMANDS:
+            return
+        with self._lock:
+            if len(self._pending) >= MAX_PENDING:
+                self._pending.clear()
+            self._pending[(event.request_id, event.connection_id)] = (
+                event.command, event.database_name, request_id_var.get())
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            started = self._pending.pop((event.request_id, event.connection_id), None)
+        if started is None or event.duration_micros < self.threshold_micros:
+            return
+
+        command, database_name, request_id = started
+        logger.warning(json_util.dumps({
+            "requestId": request_id,
+            "command": event.command_name,
+            "collection": command.get(event.command_name),
+            "filter": command.get("filter", command.get("query")),
+            "sort": command.get("sort"),
+            "pipeline": command.get("pipeline"),
+            "durationMs": round(event.duration_micros / 1000, 1),
+            "outcome": outcome
+        }))
+
+        if outcome == "success" and random.random() < settings.slow_query_explain_sample_rate:
+            explain_target = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+            self.loop.call_soon_threadsafe(
+                _schedule_explain, explain_target, database_name, request_id)
+
+
+_explain_tasks = set()
+
+
+def _schedule_explain(command: dict, database_name: str, request_id: str) -> None:
+    task = asyncio.create_task(explain(command, database_name, request_id))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+def _plan_summary(node, stages: list, indexes: list) -> None:
+    """Collect stage and index names from any explain layout (classic, SBE, $cursor)."""
+    if isinstance(node, dict):
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "indexName" in node:
+            indexes.append(node["indexName"])
+        for key, value in node.items():
+            if key not in ("rejectedPlans", "allPlansExecution"):
+                _plan_summary(value, stages, indexes)
+    elif isinstance(node, list):
+        for item in node:
+            _plan_summary(item, stages, indexes)
+
+
+def _find_key(node, key: str):
+    if isinstance(node, dict):
+        if key in node:
+            return node[key]
+        node = list(node.values())
+    if isinstance(node, list):
+        for item in node:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+
+async def explain(command: dict, database_name: str, request_id: str) -> None:
+    """Run explain("executionStats") for a slow command and log the plan it used."""
+    from database import db
+
+    token = request_id_var.set(request_id)
+    try:
+        result = await db.client[database_name].command(
+            {"explain": command, "verbosity": "executionStats"})
+        stages, indexes = [], []
+        _plan_summary(_find_key(result, "winningPlan"), stages, indexes)
+        stats = _find_key(result, "executionStats") or {}
+        logger.warning(json_util.dumps({
+            "requestId": request_id,
+            "explain": next(iter(command)),
+            "collection": command.get(next(iter(command))),
+            "stages": stages,
+            "indexes": indexes,
+            "collectionScan": "COLLSCAN" in stages,
+            "keysExamined": stats.get("totalKeysExamined"),
+            "docsExamined": stats.get("totalDocsExamined"),
+            "nReturned": stats.get("nReturned")
+        }))
+    except Exception as e:
+        logger.warning(f"explain failed for request {request_id}: {e}")
+    finally:
+        request_id_var.reset(token)
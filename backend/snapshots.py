@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from cache import summary_cache
+from config import get_settings
+from database import (get_attendance_collection, get_employees_collection,
+                      get_jobs_collection)
+from purge import NOT_DELETED
+from versions import ATTENDANCES, collection_versions
+
+settings = get_settings()
+
+SNAPSHOT_FIELDS = ("fullName", "employeeId", "department")
+SNAPSHOT_PROJECTION = {field: 1 for field in SNAPSHOT_FIELDS}
+FAN_OUT_BATCH_SIZE = 1000
+
+# Job document shared by all processes, so one of them reconciles per interval
+RECONCILE_JOB = "snapshotReconcile"
+# Each pass also rechecks employees updated this long before the last one began
+RECONCILE_OVERLAP = timedelta(minutes=5)
+
+_background_tasks = set()
+
+
+def employee_snapshot(employee: dict) -> dict:
+    """Employee fields embedded on attendance documents as ``employee``."""
+    return {field: employee.get(field, "") for field in SNAPSHOT_FIELDS}
+
+
+async def sync_employee_snapshot(employee_id: ObjectId,
+                                 snapshot: Optional[dict] = None) -> int:
+    """Rewrite stale snapshots of one employee in bounded update_many batches.
+
+    The employee is re-read before every batch after the first, so when the
+    fan-outs of two quick updates interleave, each ends by writing the
+    current snapshot rather than the one its request captured.
+    """
+    collection = get_attendance_collection()
+    updated = 0
+    while True:
+        if snapshot is None:
+            employee = await get_employees_collection().find_one(
+                {"_id": employee_id, **NOT_DELETED}, SNAPSHOT_PROJECTION)
+            if employee is None:
+                return updated
+            snapshot = employee_snapshot(employee)
+
+        cursor = collection.find(
+            {"employeeId": employee_id, "employee": {"$ne": snapshot}},
+            {"_id": 1}
+        ).limit(FAN_OUT_BATCH_SIZE)
+        ids = [doc["_id"] async for doc in cursor]
+        if not ids:
+            return updated
+
+        result = await collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"employee": snapshot}}
+        )
+        updated += result.modified_count
+        if result.modified_count:
+            # Cached aggregates such as the department matrix read snapshots
+            summary_cache.invalidate()
+            await collection_versions.bump(ATTENDANCES)
+        snapshot = None
+
+
+def schedule_snapshot_fan_out(employee_id: ObjectId, snapshot: dict) -> None:
+    """Push an employee change to its attendance records without blocking the request."""
+    task = asyncio.create_task(sync_employee_snapshot(employee_id, snapshot))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def reconcile_employee_snapshots(since: Optional[datetime] = None) -> int:
+    """Repair snapshots that drifted from their employee, including missing ones.
+
+    With ``since``, only employees updated after it are checked; without it,
+    every employee is.
+    """
+    query = dict(NOT_DELETED)
+    if since is not None:
+        query["updatedAt"] = {"$gte": since}
+    repaired = 0
+    async for employee in get_employees_collection().find(query, SNAPSHOT_PROJECTION):
+        repaired += await sync_employee_snapshot(
+            employee["_id"], employee_snapshot(employee))
+    return repaired
+
+
+async def claim_reconcile_pass(now: datetime) -> Tuple[bool, Optional[datetime]]:
+    """Claim this interval's reconciliation for this process.
+
+    Returns whether it was claimed, and the start of the last pass that
+    finished, or None when none has. Every worker runs the reconciler; the
+    job document lets one pass per interval through.
+    """
+    due = now - timedelta(seconds=settings.snapshot_reconcile_interval / 2)
+    try:
+        previous = await get_jobs_collection().find_one_and_update(
+            {"_id": RECONCILE_JOB, "startedAt": {"$lt": due}},
+            {"$set": {"startedAt": now}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Another process started a pass less than half an interval ago
+        return False, None
+    return True, (previous or {}).get("finishedSince")
+
+
+async def snapshot_reconciler():
+    """Periodically reconcile attendance snapshots against employees.
+
+    The first pass checks every employee. Later passes only check employees
+    updated since the previous pass started, less ``RECONCILE_OVERLAP`` for
+    records that were written with a snapshot read just before.
+    """
+    while True:
+        try:
+            started = datetime.utcnow()
+            claimed, since = await claim_reconcile_pass(started)
+            if claimed:
+                repaired = await reconcile_employee_snapshots(
+                    since - RECONCILE_OVERLAP if since else None)
+                await get_jobs_collection().update_one(
+                    {"_id": RECONCILE_JOB}, {"$set": {"finishedSince": started}})
+                if repaired:
+                    print(f"Reconciled {repaired} attendance employee snapshots.")
+        except Exception as e:
+            print(f"Snapshot reconciliation warning: {e}")
+        await asyncio.sleep(settings.snapshot_reconcile_interval)
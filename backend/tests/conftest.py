@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Routes run against the embedded engine, so the suite needs no mongod
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["MEMORY_SNAPSHOT_PATH"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    # Entering the client runs the lifespan, which opens a fresh memory database
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def create_employee(client):
+    def create(n: int, **fields) -> dict:
+        response = client.post("/api/employees", json={
+            "employeeId": f"E{n}", "fullName": f"Employee {n}",
+            "email": f"e{n}@example.com", "department": "Engineering", **fields})
+        assert response.status_code == 201, response.text
+        return response.json()["data"]
+    return create
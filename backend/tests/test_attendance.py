@@ -0,0 +1,36 @@
+def test_second_mark_for_the_same_day_is_rejected(client, create_employee):
+    employee = create_employee(1)
+    mark = {"employeeId": employee["_id"], "date": "2026-01-05", "status": "Present"}
+
+    assert client.post("/api/attendance", json=mark).status_code == 201
+    response = client.post("/api/attendance", json={**mark, "status": "Absent"})
+
+    assert response.status_code == 400
+    assert len(client.get("/api/attendance", params={"employeeId": employee["_id"]})
+               .json()["data"]) == 1
+
+
+def test_rollup_built_across_a_write_is_not_saved(client, create_employee, monkeypatch):
+    import rollups
+    from database import get_attendance_collection
+
+    employee = create_employee(1)
+    client.post("/api/attendance", json={"employeeId": employee["_id"],
+                                         "date": "2025-01-06", "status": "Present"})
+    aggregate_periods = rollups.aggregate_periods
+
+    async def aggregate_then_write(employee_id, start, end, *args, **kwargs):
+        periods = await aggregate_periods(employee_id, start, end, *args, **kwargs)
+        # Another worker changes the month before this build is saved
+        await get_attendance_collection().update_one(
+            {"employeeId": employee_id}, {"$set": {"status": "Absent"}})
+        await rollups.invalidate_monthly_rollups([(employee_id, start)])
+        return periods
+
+    monkeypatch.setattr(rollups, "aggregate_periods", aggregate_then_write)
+    stats = f"/api/attendance/employee/{employee['_id']}/stats"
+    params = {"from": "2025-01-01", "to": "2025-01-31"}
+    assert client.get(stats, params=params).json()["data"]["totalPresent"] == 1
+    monkeypatch.undo()
+
+    assert client.get(stats, params=params).json()["data"]["totalPresent"] == 0
@@ -0,0 +1,42 @@
+def test_pagination_returns_newest_first_without_gaps(client, create_employee):
+    created = [create_employee(n)["_id"] for n in range(5)]
+
+    seen = []
+    after = None
+    while True:
+        params = {"limit": 2, **({"after": after} if after else {})}
+        page = client.get("/api/employees", params=params).json()
+        seen += [employee["_id"] for employee in page["data"]]
+        after = page["nextCursor"]
+        if not after:
+            break
+
+    assert seen == created[::-1]
+
+
+def test_deleted_employee_keys_are_reusable_before_purge(client, create_employee):
+    deleted = create_employee(1)
+    other = create_employee(2)
+    assert client.delete(f"/api/employees/{deleted['_id']}").status_code == 200
+
+    recreated = create_employee(1)
+    assert recreated["_id"] != deleted["_id"]
+
+    response = client.put(f"/api/employees/{other['_id']}",
+                          json={"email": "e1@example.com"})
+    assert response.status_code == 400
+    assert response.json()["detail"]["message"] == "Email already exists"
+
+    response = client.delete(f"/api/employees/{recreated['_id']}")
+    assert response.status_code == 200
+    assert client.put(f"/api/employees/{other['_id']}",
+                      json={"email": "e1@example.com"}).status_code == 200
+
+
+def test_blank_search_is_rejected(client, create_employee):
+    create_employee(1)
+
+    response = client.get("/api/employees/search", params={"q": " "})
+
+    assert response.status_code == 400
+    assert client.get("/api/employees/search", params={"q": " e1 "}).json()["total"] == 1
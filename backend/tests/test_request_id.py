@@ -0,0 +1,11 @@
+import re
+
+
+def test_request_id_is_echoed_or_replaced(client):
+    response = client.get("/", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["x-request-id"] == "abc-123"
+
+    # obs-text bytes are valid in a header but not a usable ID
+    response = client.get("/", headers=[(b"X-Request-ID", b"caf\xe9")])
+    assert response.status_code == 200
+    assert re.fullmatch(r"[0-9a-f]{32}", response.headers["x-request-id"])
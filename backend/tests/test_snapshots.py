@@ -0,0 +1,58 @@
+import asyncio
+
+from bson import ObjectId
+
+
+def test_fan_out_with_a_stale_snapshot_ends_on_the_current_one(client, create_employee):
+    import snapshots
+    from database import get_attendance_collection
+
+    employee = create_employee(1)
+    for day in range(1, 6):
+        client.post("/api/attendance", json={"employeeId": employee["_id"],
+                                             "date": f"2026-01-0{day}", "status": "Present"})
+    client.put(f"/api/employees/{employee['_id']}", json={"department": "D2"})
+
+    # A fan-out from an earlier update that finishes after the latest one
+    stale = {**snapshots.employee_snapshot(employee), "department": "D1"}
+    asyncio.run(snapshots.sync_employee_snapshot(ObjectId(employee["_id"]), stale))
+
+    async def departments():
+        cursor = get_attendance_collection().find({"employeeId": ObjectId(employee["_id"])})
+        return {record["employee"]["department"] async for record in cursor}
+
+    assert asyncio.run(departments()) == {"D2"}
+
+
+def test_reconciliation_runs_once_per_interval_across_processes(client):
+    from datetime import datetime, timedelta
+
+    import snapshots
+
+    async def claims():
+        now = datetime.utcnow() + timedelta(days=1)
+        first = await snapshots.claim_reconcile_pass(now)
+        # A second worker waking moments later finds the pass taken
+        second = await snapshots.claim_reconcile_pass(now + timedelta(seconds=1))
+        return first[0], second[0]
+
+    assert client.portal.call(claims) == (True, False)
+
+
+def test_incremental_reconciliation_skips_unchanged_employees(client, create_employee):
+    from datetime import datetime
+
+    import snapshots
+    from database import get_attendance_collection
+
+    employee = create_employee(1)
+    client.post("/api/attendance", json={"employeeId": employee["_id"],
+                                         "date": "2026-01-05", "status": "Present"})
+
+    async def drift_and_reconcile(since):
+        await get_attendance_collection().update_many(
+            {}, {"$set": {"employee.department": "Drifted"}})
+        return await snapshots.reconcile_employee_snapshots(since)
+
+    assert client.portal.call(drift_and_reconcile, datetime.utcnow()) == 0
+    assert client.portal.call(drift_and_reconcile, None) == 1
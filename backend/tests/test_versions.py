@@ -0,0 +1,56 @@
+import asyncio
+
+from bson import ObjectId
+
+
+def test_write_by_another_worker_changes_the_etag(client, create_employee):
+    from database import get_employees_collection, get_versions_collection
+    from versions import EMPLOYEES
+
+    employee = create_employee(1)
+    first = client.get("/api/employees")
+    etag = first.headers["etag"]
+    assert client.get("/api/employees", headers={"If-None-Match": etag}).status_code == 304
+
+    # Another worker renames the employee and bumps the shared version
+    async def write_elsewhere():
+        await get_employees_collection().update_one(
+            {"_id": ObjectId(employee["_id"])}, {"$set": {"fullName": "Renamed"}})
+        await get_versions_collection().update_one(
+            {"_id": EMPLOYEES}, {"$set": {"version": ObjectId()}})
+    asyncio.run(write_elsewhere())
+
+    response = client.get("/api/employees", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["data"][0]["fullName"] == "Renamed"
+
+
+def test_delete_seen_on_the_change_stream_hides_attendance(client, create_employee):
+    from events import forget_cached
+    from purge import pending_employee_deletes
+
+    deleted_id = ObjectId(create_employee(1)["_id"])
+
+    # Checked on the app's loop, before the purger can drain the set
+    async def forget_delete():
+        forget_cached([{"collection": "employees", "op": "delete", "id": deleted_id}])
+        return deleted_id in pending_employee_deletes()
+
+    assert client.portal.call(forget_delete)
+
+
+def test_attendance_for_an_employee_deleted_elsewhere_is_rejected(client, create_employee):
+    from database import get_employees_collection
+
+    employee = create_employee(1)
+    mark = {"employeeId": employee["_id"], "date": "2026-01-05", "status": "Present"}
+    # Caches the employee on this worker
+    assert client.post("/api/attendance", json=mark).status_code == 201
+
+    async def delete_elsewhere():
+        await get_employees_collection().delete_one({"_id": ObjectId(employee["_id"])})
+    asyncio.run(delete_elsewhere())
+
+    response = client.post("/api/attendance", json={**mark, "date": "2026-01-06"})
+    assert response.status_code == 404
+    assert client.get(f"/api/attendance/employee/{employee['_id']}").status_code == 404
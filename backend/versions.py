@@ -0,0 +1,96 @@
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import Request, Response
+from pymongo import UpdateOne
+
+from cache import employee_cache, summary_cache
+
+EMPLOYEES = "employees"
+ATTENDANCES = "attendances"
+
+
+def _versions_collection():
+    # Imported here: database imports this module
+    from database import get_versions_collection
+    return get_versions_collection()
+
+
+class CollectionVersions:
+    """Per-collection change versions, kept in the ``versions`` collection.
+
+    Every write route bumps them and every conditional GET reads them first,
+    so all server processes agree on the current ETag. Each bump stores a new
+    ObjectId, so versions never repeat, even after the database is reset.
+    """
+
+    def __init__(self):
+        # Latest version and write time this process has seen per collection
+        self._versions = {}
+        self._bumped_at = {}
+
+    async def bump(self, *collections: str) -> None:
+        now = datetime.utcnow()
+        versions = {name: ObjectId() for name in collections}
+        await _versions_collection().bulk_write([
+            UpdateOne({"_id": name}, {"$set": {"version": version, "bumpedAt": now}},
+                      upsert=True)
+            for name, version in versions.items()])
+        self._versions.update(versions)
+        self._bumped_at.update(dict.fromkeys(versions, now))
+
+    async def refresh(self, *collections: str) -> None:
+        """Catch up with writes made by other server processes.
+
+        Their writes drop this process's caches, and an employee write
+        reloads the soft deletes whose attendance reads must hide.
+        """
+        changed = set()
+        async for doc in _versions_collection().find({"_id": {"$in": list(collections)}}):
+            if doc["version"] != self._versions.get(doc["_id"]):
+                changed.add(doc["_id"])
+                self._versions[doc["_id"]] = doc["version"]
+                self._bumped_at[doc["_id"]] = doc["bumpedAt"]
+        if not changed:
+            return
+        summary_cache.invalidate()
+        if EMPLOYEES in changed:
+            employee_cache.invalidate()
+            # Imported here: purge imports this module
+            from purge import load_pending_deletes
+            await load_pending_deletes()
+
+    def get(self, name: str) -> Optional[ObjectId]:
+        return self._versions.get(name)
+
+    def changed_within(self, name: str, seconds: float) -> bool:
+        """Whether ``name`` was written in the last ``seconds``, as far as this process knows."""
+        bumped_at = self._bumped_at.get(name)
+        return bumped_at is not None and \
+            (datetime.utcnow() - bumped_at).total_seconds() < seconds
+
+    def etag(self, request: Request, *collections: str) -> str:
+        versions = ".".join(str(self._versions.get(name, 0)) for name in collections)
+        variant = zlib.crc32(
+            f"{request.url.path}?{request.url.query}|{request.headers.get('accept', '')}".encode())
+        return f'W/"{versions}-{variant:08x}"'
+
+
+collection_versions = CollectionVersions()
+
+
+async def conditional_get(request: Request, response: Response,
+                          *collections: str) -> Optional[Response]:
+    """Return a 304 when the client's ETag is current, else tag ``response``."""
+    await collection_versions.refresh(*collections)
+    etag = collection_versions.etag(request, *collections)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -35,7 +35,29 @@ const apiRequest = async (endpoint, options = {}) => {
 };
 
 export const employeeAPI = {
-  getAll: () => apiRequest("/employees"),
+  getPage: (params = {}) => {
+    const queryString = new URLSearchParams(params).toString();
+    return apiRequest(`/employees${queryString ? `?${queryString}` : ""}`);
+  },
+
+  // Follows nextCursor until every page has been loaded
+  getAll: async () => {
+    const data = [];
+    let after = null;
+    do {
+      const params = { limit: 1000, ...(after ? { after } : {}) };
+      const page = await employeeAPI.getPage(params);
+      data.push(...(page.data || []));
+      after = page.nextCursor;
+    } while (after);
+    return { success: true, data };
+  },
+
+  // Prefix search on name, employee ID and email, with department facets
+  search: (q, params = {}) => {
+    const queryString = new URLSearchParams({ q, ...params }).toString();
+    return apiRequest(`/employees/search?${queryString}`);
+  },
 
   getById: (id) => apiRequest(`/employees/${id}`),
 
@@ -45,6 +67,18 @@ export const employeeAPI = {
       body: JSON.stringify(employeeData),
     }),
 
+  // Streams a .csv or .ndjson File; the report lists only failed rows
+  import: (file) =>
+    apiRequest("/employees/import", {
+      method: "POST",
+      headers: {
+        "Content-Type": file.name.toLowerCase().endsWith(".csv")
+          ? "text/csv"
+          : "application/x-ndjson",
+      },
+      body: file,
+    }),
+
   update: (id, employeeData) =>
     apiRequest(`/employees/${id}`, {
       method: "PUT",
@@ -66,12 +100,25 @@ export const attendanceAPI = {
   getByEmployee: (employeeId) =>
     apiRequest(`/attendance/employee/${employeeId}`),
 
+  getStats: (employeeId, params = {}) => {
+    const queryString = new URLSearchParams(params).toString();
+    return apiRequest(
+      `/attendance/employee/${employeeId}/stats${queryString ? `?${queryString}` : ""}`,
+    );
+  },
+
   create: (attendanceData) =>
     apiRequest("/attendance", {
       method: "POST",
       body: JSON.stringify(attendanceData),
     }),
 
+  createBulk: (records) =>
+    apiRequest("/attendance/bulk", {
+      method: "POST",
+      body: JSON.stringify(records),
+    }),
+
   update: (id, attendanceData) =>
     apiRequest(`/attendance/${id}`, {
       method: "PUT",
@@ -84,6 +131,63 @@ export const attendanceAPI = {
     }),
 
   getSummary: () => apiRequest("/attendance/summary"),
+
+  getMatrix: (params = {}) => {
+    const queryString = new URLSearchParams(params).toString();
+    return apiRequest(`/attendance/matrix${queryString ? `?${queryString}` : ""}`);
+  },
+
+  // Download link for the streamed CSV / Parquet export ({ from, to, format })
+  getExportUrl: (params = {}) => {
+    const queryString = new URLSearchParams(params).toString();
+    return `${API_BASE_URL}/attendance/export${queryString ? `?${queryString}` : ""}`;
+  },
+};
+
+const WATCHED_COLLECTIONS = ["employees", "attendances"];
+
+export const eventsAPI = {
+  // Live change feed from GET /api/events. Bursts are coalesced: onChange
+  // receives the Set of changed collections at most every 300 ms.
+  subscribe: (onChange) => {
+    const source = new EventSource(`${API_BASE_URL}/events`);
+    let pending = new Set();
+    let timer = null;
+    let connected = false;
+
+    const queue = (collections) => {
+      collections.forEach((name) => pending.add(name));
+      if (!timer) {
+        timer = setTimeout(() => {
+          const changed = pending;
+          pending = new Set();
+          timer = null;
+          onChange(changed);
+        }, 300);
+      }
+    };
+
+    source.addEventListener("change", (event) => {
+      queue([JSON.parse(event.data).collection]);
+    });
+    // Events may have been missed while dropped or disconnected
+    source.addEventListener("resync", () => queue(WATCHED_COLLECTIONS));
+    source.addEventListener("ready", () => {
+      if (connected) queue(WATCHED_COLLECTIONS);
+      connected = true;
+    });
+
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
+  },
+};
+
+export const syncAPI = {
+  // Changes since a previous token; follow token while hasMore is true
+  getChanges: (since) =>
+    apiRequest(`/sync${since ? `?since=${encodeURIComponent(since)}` : ""}`),
 };
 
-export default { employeeAPI, attendanceAPI };
+export default { employeeAPI, attendanceAPI, eventsAPI, syncAPI };
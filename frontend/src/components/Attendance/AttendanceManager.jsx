@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from "react";
-import { attendanceAPI, employeeAPI } from "../../api/apiService";
+import { attendanceAPI, employeeAPI, eventsAPI } from "../../api/apiService";
 import AttendanceForm from "./AttendanceForm";
 import LoadingSpinner from "../common/LoadingSpinner";
 import EmptyState from "../common/EmptyState";
@@ -25,9 +25,9 @@ const AttendanceManager = ({ selectedEmployee, onBack, showToast }) => {
     }
   }, []);
 
-  const fetchAttendance = useCallback(async () => {
+  const fetchAttendance = useCallback(async ({ quiet = false } = {}) => {
     try {
-      setLoading(true);
+      if (!quiet) setLoading(true);
       setError(null);
 
       let response;
@@ -54,6 +54,16 @@ const AttendanceManager = ({ selectedEmployee, onBack, showToast }) => {
     fetchAttendance();
   }, [fetchAttendance]);
 
+  // Other users' changes arrive over the live event stream
+  useEffect(
+    () =>
+      eventsAPI.subscribe((changed) => {
+        if (changed.has("employees")) fetchEmployees();
+        fetchAttendance({ quiet: true });
+      }),
+    [fetchEmployees, fetchAttendance],
+  );
+
   const handleMarkAttendance = () => {
     setShowForm(true);
   };
@@ -163,7 +173,7 @@ const AttendanceManager = ({ selectedEmployee, onBack, showToast }) => {
   }
 
   if (error) {
-    return <ErrorState message={error} onRetry={fetchAttendance} />;
+    return <ErrorState message={error} onRetry={() => fetchAttendance()} />;
   }
 
   return (
@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from "react";
-import { employeeAPI, attendanceAPI } from "../../api/apiService";
+import { employeeAPI, attendanceAPI, eventsAPI } from "../../api/apiService";
 import LoadingSpinner from "../common/LoadingSpinner";
 import ErrorState from "../common/ErrorState";
 import "./Dashboard.css";
@@ -11,9 +11,10 @@ const Dashboard = ({ onNavigate }) => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  const fetchDashboardData = useCallback(async () => {
+  // Live updates refresh quietly, without swapping in the loading spinner
+  const fetchDashboardData = useCallback(async ({ quiet = false } = {}) => {
     try {
-      setLoading(true);
+      if (!quiet) setLoading(true);
       setError(null);
 
       const [summaryRes, employeesRes] = await Promise.all([
@@ -38,6 +39,11 @@ const Dashboard = ({ onNavigate }) => {
     fetchDashboardData();
   }, [fetchDashboardData]);
 
+  useEffect(
+    () => eventsAPI.subscribe(() => fetchDashboardData({ quiet: true })),
+    [fetchDashboardData],
+  );
+
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleDateString("en-US", {
       month: "short",
@@ -58,7 +64,7 @@ const Dashboard = ({ onNavigate }) => {
   }
 
   if (error) {
-    return <ErrorState message={error} onRetry={fetchDashboardData} />;
+    return <ErrorState message={error} onRetry={() => fetchDashboardData()} />;
   }
 
   return (